@@ -10,41 +10,209 @@ Changes:
 - Protocol tab with extra step types: aspirate / dispense.
 """
 
+import argparse
+import concurrent.futures
 import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import deque
+from functools import partial
+from typing import Callable
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, filedialog
 
 from src.robot import Robot
 from src.deck import Deck
 from src.labware import SYRINGES, LABWARE_BEAKER_1WELL
+from src.protocol import ProtocolRunner, STEP_TYPES, validate_step
 import requests
+from requests.adapters import HTTPAdapter
+
+# 协议 JSON 读写：优先用 orjson（更快，且默认保留中文），未安装时退回标准库
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
 
 
 GPT_API_URL = "http://43.165.0.74:8000/generate_protocol"
 
 
+class _DaemonExecutor(concurrent.futures.Executor):
+    """
+    每个任务开一个守护线程执行的极简 Executor。
+
+    ThreadPoolExecutor 的线程在解释器退出时会被 join；GPT 流式请求的读超时长达
+    300 s，关窗时若请求还在进行，进程会被拖住。守护线程则随主线程一起退出。
+    """
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+
+        def _run() -> None:
+            if not fut.set_running_or_notify_cancel():
+                return
+            try:
+                fut.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                fut.set_exception(e)
+
+        threading.Thread(target=_run, name="gpt-request", daemon=True).start()
+        return fut
+
+# 协议标签页里的参数示例（中英文各一份，只在模块加载时构造一次）
+_EXAMPLE_EN = (
+    "Examples:\n"
+    "transfer: {\"src_slot\":\"4\",\"src_well\":\"A1\","
+    "\"dst_slot\":\"4\",\"dst_well\":\"B3\",\"volume_ul\":50}\n"
+    "pick_tip: {\"slot\":\"1\",\"well\":\"A1\"}\n"
+    "drop_tip: {\"slot\":\"2\",\"edge\":\"left\"}\n"
+    "aspirate well: {\"slot\":\"4\",\"well\":\"A1\",\"volume_ul\":50}\n"
+    "aspirate XY:   {\"z_safe\":152.0,\"z_aspirate\":158.0,\"volume_ul\":50}\n"
+    "dispense well: {\"slot\":\"4\",\"well\":\"B3\",\"volume_ul\":50}\n"
+    "dispense XY:   {\"z_safe\":152.0,\"z_dispense\":158.0,\"volume_ul\":50}\n"
+    "dwell: {\"seconds\":2.0}"
+)
+_EXAMPLE_ZH = (
+    "示例:\n"
+    "transfer: {\"src_slot\":\"4\",\"src_well\":\"A1\","
+    "\"dst_slot\":\"4\",\"dst_well\":\"B3\",\"volume_ul\":50}\n"
+    "pick_tip: {\"slot\":\"1\",\"well\":\"A1\"}\n"
+    "drop_tip: {\"slot\":\"2\",\"edge\":\"left\"}\n"
+    "aspirate 孔位: {\"slot\":\"4\",\"well\":\"A1\",\"volume_ul\":50}\n"
+    "aspirate 当前XY: {\"z_safe\":152.0,\"z_aspirate\":158.0,\"volume_ul\":50}\n"
+    "dispense 孔位: {\"slot\":\"4\",\"well\":\"B3\",\"volume_ul\":50}\n"
+    "dispense 当前XY: {\"z_safe\":152.0,\"z_dispense\":158.0,\"volume_ul\":50}\n"
+    "dwell: {\"seconds\":2.0}"
+)
+
+# 运行时提示文本：key → (English, 中文)。切换语言时整体解析一次到 self._STR
+_STRINGS: dict[str, tuple[str, str]] = {
+    "title": ("Pipette Robot GUI", "移液机器人界面"),
+    "not_connected": ("Robot not connected.", "未连接机器人。"),
+    "save_protocol": ("Save Protocol", "保存协议"),
+    "load_protocol": ("Load Protocol", "载入协议"),
+    "save_log": ("Save Log", "保存日志"),
+    "gpt_empty": ("Please enter text to send to GPT.", "请输入要发送给 GPT 的内容。"),
+    "gpt_request_fmt": ("[GPT] Request: {text}", "[GPT] 请求：{text}"),
+    "gpt_error_fmt": ("[ERROR] Call GPT failed: {err}", "[ERROR] 调用 GPT 失败: {err}"),
+    "gpt_no_result": ("(no 'result' field)", "(无 result 字段)"),
+}
+
+# Jog 按钮：名字 → 各轴方向 (X, Y, Z, U)，以及在 Jog 面板中的网格位置 (row, col)
+_JOG_DIRS: dict[str, tuple[int, int, int, int]] = {
+    "Y+": (0, +1, 0, 0),
+    "Y-": (0, -1, 0, 0),
+    "X-": (-1, 0, 0, 0),
+    "X+": (+1, 0, 0, 0),
+    "Z+": (0, 0, +1, 0),
+    "Z-": (0, 0, -1, 0),
+    "U+": (0, 0, 0, +1),
+    "U-": (0, 0, 0, -1),
+}
+_JOG_GRID: dict[str, tuple[int, int]] = {
+    "Y+": (1, 1),
+    "Y-": (3, 1),
+    "X-": (2, 0),
+    "X+": (2, 2),
+    "Z+": (1, 3),
+    "Z-": (3, 3),
+    "U+": (1, 4),
+    "U-": (3, 4),
+}
+
+
 class PipetteGUI:
+    # 日志框最多保留的行数；超过后一次性删掉最旧的 LOG_TRIM 行
+    LOG_MAX = 2000
+    LOG_TRIM = 500
+    # 日志 / GPT 输出的合并刷新间隔（约 30 Hz）
+    FLUSH_MS = 33
+
     def __init__(self, root: tk.Tk) -> None:
         self.root = root
 
         # 当前语言：zh / en
         self.current_lang = "zh"
-        self.root.title(self._l("Pipette Robot GUI", "移液机器人界面"))
+        self._STR: dict[str, str] = {}
+        self._resolve_strings()
+        self.root.title(self._STR["title"])
 
         self.robot: Robot | None = None
         self.deck: Deck | None = None
         self.protocol_steps: list[dict] = []
+        # 步骤列表每改动一次加 1；编译好的 ProtocolRunner 按版本号缓存
+        self._protocol_version = 0
+        self._runner: ProtocolRunner | None = None
+        self._runner_key: tuple | None = None
+
+        # 可翻译控件登记表：切换语言时只改 text，不再销毁重建
+        self._i18n_widgets: list[tuple[tk.Widget, str, str]] = []
+        self._i18n_tabs: list[tuple[ttk.Notebook, tk.Widget, str, str]] = []
+
+        # 状态栏：显示最近一次错误
+        self.var_status = tk.StringVar()
+        self._status_clear_id: str | None = None
+
+        # 输入框对应的 StringVar，按名字登记，便于一次性读取
+        self._vars: dict[str, tk.StringVar] = {}
+
+        # 串口通讯是阻塞的，放到单独的工作线程执行，避免界面卡死
+        self._worker = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # GPT 请求可能持续几分钟，用独立的守护线程，不占用串口工作线程，也不拖住关窗退出
+        # （发送按钮在请求期间禁用，同一时间只有一个请求）
+        self._net_worker = _DaemonExecutor()
+
+        # 协议运行状态：_cancel 由主线程置位，工作线程在步骤之间检查
+        self._cancel = threading.Event()
+        self._protocol_running = False
+        # 窗口已关闭：之后工作线程的回调一律丢弃，避免对已销毁的 Tk 调用 after
+        self._closing = False
+
+        # 日志先缓存在内存里，由 _flush_log 合并成一次 Text.insert
+        self._log_pending: deque[str] = deque()
+        self._log_flush_scheduled = False
+        self._chat_pending: deque[str] = deque()
+        self._chat_flush_scheduled = False
+        # 日志框只保留最近 LOG_MAX 行，完整日志同时写入临时文件，可用 Save Log 另存
+        self._log_file = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", prefix="pipette_log_", suffix=".txt", delete=False
+        )
 
-        # ---------- 样式 ----------
-        style = ttk.Style(self.root)
-        try:
-            style.theme_use("clam")
-        except tk.TclError:
-            pass
-
-        style.configure("TLabelframe", padding=8)
-        style.configure("TButton", padding=4)
-        style.configure("TNotebook.Tab", padding=(12, 6))
+        # 刷新坐标 / Jog 的合并定时器：连续点击只发一次串口命令
+        self._pending_refresh: str | None = None
+        self._pending_jog: str | None = None
+        self._jog_accum = [0.0, 0.0, 0.0, 0.0]   # dX, dY, dZ, dU
+        self._jog_busy = False
+
+        # 最近一次 M114 读到的坐标
+        self._pos = {"X": 0.0, "Y": 0.0, "Z": 0.0, "U": 0.0}
+
+        # GPT 接口复用同一个 HTTP 会话（keep-alive），避免每次重新建立连接
+        self._http = requests.Session()
+        self._http.headers.update({
+            "Connection": "keep-alive",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=2)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        self._apply_styles()
 
         # 顶部语言切换条
         topbar = ttk.Frame(root)
@@ -60,12 +228,58 @@ class PipetteGUI:
 
         self._build_main_ui()
 
+    def _apply_styles(self) -> None:
+        """ttk 样式是全局的，启动时配置一次即可。"""
+        style = ttk.Style(self.root)
+        try:
+            style.theme_use("clam")
+        except tk.TclError:
+            pass
+
+        style.configure("TLabelframe", padding=8)
+        style.configure("TButton", padding=4)
+        style.configure("TNotebook.Tab", padding=(12, 6))
+
     # ==================================================
     # 语言
     # ==================================================
     def _l(self, en: str, zh: str) -> str:
         return zh if self.current_lang == "zh" else en
 
+    def _resolve_strings(self) -> None:
+        """按当前语言解析 _STRINGS，运行时直接查 self._STR。"""
+        idx = 1 if self.current_lang == "zh" else 0
+        self._STR = {key: pair[idx] for key, pair in _STRINGS.items()}
+
+    def _on_close(self) -> None:
+        """
+        关闭窗口时停止正在运行的协议、释放 HTTP 会话和工作线程，并断开串口。
+        """
+        self._closing = True
+        self._cancel.set()
+        self._worker.shutdown(wait=False, cancel_futures=True)
+        self._net_worker.shutdown(wait=False, cancel_futures=True)
+        robot, self.robot = self.robot, None
+        if robot is not None:
+            # 等当前串口任务在步骤之间退出后再断开；非守护线程，解释器退出前会等它完成
+            worker = self._worker
+
+            def _disconnect() -> None:
+                worker.shutdown(wait=True)
+                try:
+                    robot.disconnect()
+                except Exception:
+                    pass
+
+            threading.Thread(target=_disconnect, name="robot-close").start()
+        self._http.close()
+        self._log_file.close()
+        try:
+            os.remove(self._log_file.name)
+        except OSError:
+            pass
+        self.root.destroy()
+
     def _update_lang_button_text(self) -> None:
         if self.current_lang == "zh":
             self.btn_lang.config(text="English")
@@ -74,58 +288,92 @@ class PipetteGUI:
 
     def on_toggle_language(self) -> None:
         self.current_lang = "en" if self.current_lang == "zh" else "zh"
-        self.root.title(self._l("Pipette Robot GUI", "移液机器人界面"))
+        self._resolve_strings()
+        self.root.title(self._STR["title"])
         self._update_lang_button_text()
 
-        for child in self.main_frame.winfo_children():
-            child.destroy()
-        self._build_main_ui()
+        zh = self.current_lang == "zh"
+        for widget, en_text, zh_text in self._i18n_widgets:
+            widget.configure(text=zh_text if zh else en_text)
+        for nb, tab, en_text, zh_text in self._i18n_tabs:
+            nb.tab(tab, text=zh_text if zh else en_text)
+
+    def _i18n(self, widget: tk.Widget, en: str, zh: str) -> tk.Widget:
+        """登记可翻译控件并设置当前语言的文本。"""
+        widget.configure(text=self._l(en, zh))
+        self._i18n_widgets.append((widget, en, zh))
+        return widget
+
+    def _retext(self, widget: tk.Widget, en: str, zh: str) -> None:
+        """修改已登记控件的中英文文本（如 Run / Cancel 切换）。"""
+        for i, (w, _, _) in enumerate(self._i18n_widgets):
+            if w is widget:
+                self._i18n_widgets[i] = (widget, en, zh)
+                break
+        widget.configure(text=self._l(en, zh))
+
+    def _mk_label(self, parent: tk.Widget, en: str, zh: str, **kw) -> ttk.Label:
+        return self._i18n(ttk.Label(parent, **kw), en, zh)
+
+    def _mk_button(self, parent: tk.Widget, en: str, zh: str, **kw) -> ttk.Button:
+        return self._i18n(ttk.Button(parent, **kw), en, zh)
+
+    def _mk_labelframe(self, parent: tk.Widget, en: str, zh: str, **kw) -> ttk.LabelFrame:
+        return self._i18n(ttk.LabelFrame(parent, **kw), en, zh)
+
+    def _add_tab(self, nb: ttk.Notebook, frm: tk.Widget, en: str, zh: str) -> None:
+        nb.add(frm, text=self._l(en, zh))
+        self._i18n_tabs.append((nb, frm, en, zh))
 
     # ==================================================
     # 主界面
     # ==================================================
     def _build_main_ui(self) -> None:
         # ---------- 连接 / 回零 ----------
-        frm_top = ttk.LabelFrame(
+        frm_top = self._mk_labelframe(
             self.main_frame,
-            text=self._l("Connection / Homing", "连接与回零"),
+            "Connection / Homing", "连接与回零",
         )
         frm_top.pack(fill="x", padx=8, pady=4)
 
-        ttk.Label(frm_top, text=self._l("Port:", "串口:")).grid(
+        self._mk_label(frm_top, "Port:", "串口:").grid(
             row=0, column=0, sticky="w", padx=4, pady=2
         )
-        self.var_port = tk.StringVar(value="COM4")
+        self.var_port = self._var("port", "COM4")
         ttk.Entry(frm_top, textvariable=self.var_port, width=10).grid(
             row=0, column=1, padx=4, pady=2
         )
 
-        ttk.Button(
+        self.btn_connect = self._mk_button(
             frm_top,
-            text=self._l("Connect", "连接"),
+            "Connect", "连接",
             command=self.on_connect,
-        ).grid(row=0, column=2, padx=4, pady=2)
-        ttk.Button(
+        )
+        self.btn_connect.grid(row=0, column=2, padx=4, pady=2)
+        self.btn_disconnect = self._mk_button(
             frm_top,
-            text=self._l("Disconnect", "断开"),
+            "Disconnect", "断开",
             command=self.on_disconnect,
-        ).grid(row=0, column=3, padx=4, pady=2)
+        )
+        self.btn_disconnect.grid(row=0, column=3, padx=4, pady=2)
 
-        ttk.Button(
+        self.btn_home_xyz = self._mk_button(
             frm_top,
-            text=self._l("Home XYZ", "回零 XYZ"),
+            "Home XYZ", "回零 XYZ",
             command=self.on_home_xyz,
-        ).grid(row=1, column=0, padx=4, pady=2)
-        ttk.Button(
+        )
+        self.btn_home_xyz.grid(row=1, column=0, padx=4, pady=2)
+        self.btn_home_all = self._mk_button(
             frm_top,
-            text=self._l("Home All", "全轴回零"),
+            "Home All", "全轴回零",
             command=self.on_home_all,
-        ).grid(row=1, column=1, padx=4, pady=2)
+        )
+        self.btn_home_all.grid(row=1, column=1, padx=4, pady=2)
 
-        ttk.Label(frm_top, text=self._l("Syringe:", "注射器:")).grid(
+        self._mk_label(frm_top, "Syringe:", "注射器:").grid(
             row=0, column=4, sticky="e", padx=4, pady=2
         )
-        self.var_syringe = tk.StringVar(value="1ml")
+        self.var_syringe = self._var("syringe", "1ml")
         cmb_syr = ttk.Combobox(
             frm_top,
             textvariable=self.var_syringe,
@@ -139,38 +387,69 @@ class PipetteGUI:
         nb = ttk.Notebook(self.main_frame)
         nb.pack(fill="both", expand=True, padx=8, pady=4)
 
-        self._build_tab_tips(nb)
-        self._build_tab_work(nb)
-        self._build_tab_protocol(nb)
-        self._build_tab_gpt_chat(nb)
+        # 除 Work（坐标 / Jog）外，其余标签页的内容在第一次被选中时才创建
+        self.nb = nb
+        self._tab_builders: dict[str, Callable[[ttk.Frame], None]] = {}
+        for en, zh, builder, lazy in (
+            ("Tips", "吸头操作", self._build_tab_tips, True),
+            ("Work", "移液 / 坐标", self._build_tab_work, False),
+            ("Protocol", "协议", self._build_tab_protocol, True),
+            ("GPT Helper", "GPT 助手", self._build_tab_gpt_chat, True),
+        ):
+            frm = ttk.Frame(nb)
+            self._add_tab(nb, frm, en, zh)
+            if lazy:
+                self._tab_builders[str(frm)] = builder
+            else:
+                builder(frm)
+        nb.bind("<<NotebookTabChanged>>", self._on_tab_change)
+        # 默认选中的第一个标签页立即创建
+        self._on_tab_change()
 
         # ---------- 日志 ----------
-        frm_log = ttk.LabelFrame(self.main_frame, text=self._l("Log", "日志"))
+        frm_log = self._mk_labelframe(self.main_frame, "Log", "日志")
         frm_log.pack(fill="both", expand=True, padx=8, pady=(0, 8))
 
-        self.txt_log = tk.Text(frm_log, height=8, wrap="word")
+        self._mk_button(
+            frm_log,
+            "Save Log...", "保存日志...",
+            command=self.on_save_log,
+        ).pack(anchor="e", padx=4, pady=(4, 0))
+
+        self.txt_log = self._readonly_text(tk.Text(frm_log, height=8, wrap="word"))
         self.txt_log.pack(fill="both", expand=True, padx=4, pady=4)
 
+        # ---------- 状态栏（代替错误弹框）----------
+        ttk.Label(
+            self.main_frame,
+            textvariable=self.var_status,
+            foreground="red",
+        ).pack(fill="x", padx=8, pady=(0, 4))
+
+    def _on_tab_change(self, event: tk.Event | None = None) -> None:
+        """第一次切换到某个标签页时，创建它的内容。"""
+        tab_id = self.nb.select()
+        builder = self._tab_builders.pop(tab_id, None)
+        if builder is not None:
+            builder(self.nb.nametowidget(tab_id))
+
     # ==================================================
     # Tab1：Tips（戴 / 扔）
     # ==================================================
-    def _build_tab_tips(self, nb: ttk.Notebook) -> None:
-        frm = ttk.Frame(nb)
-        nb.add(frm, text=self._l("Tips", "吸头操作"))
-
+    def _build_tab_tips(self, frm: ttk.Frame) -> None:
         # 戴 tip
-        frm_pick = ttk.LabelFrame(frm, text=self._l("Pick Tip", "戴吸头"))
+        frm_pick = self._mk_labelframe(frm, "Pick Tip", "戴吸头")
         frm_pick.grid(row=0, column=0, padx=8, pady=8, sticky="nsew")
 
-        ttk.Label(frm_pick, text=self._l("Slot:", "槽位:")).grid(
+        self._mk_label(frm_pick, "Slot:", "槽位:").grid(
             row=0, column=0, padx=4, pady=4, sticky="e"
         )
-        ttk.Label(frm_pick, text=self._l("Well:", "孔位:")).grid(
+        self._mk_label(frm_pick, "Well:", "孔位:").grid(
             row=1, column=0, padx=4, pady=4, sticky="e"
         )
 
-        self.var_tip_slot = tk.StringVar(value="1")
-        self.var_tip_well = tk.StringVar(value="A1")
+        self.var_tip_slot = self._var("tip_slot", "1")
+        self.var_tip_well = self._var("tip_well", "A1")
 
         ttk.Entry(frm_pick, textvariable=self.var_tip_slot, width=6).grid(
             row=0, column=1, padx=4, pady=4
@@ -179,28 +458,29 @@ class PipetteGUI:
             row=1, column=1, padx=4, pady=4
         )
 
-        ttk.Button(
+        self.btn_pick_tip = self._mk_button(
             frm_pick,
-            text=self._l("Pick Up Tip", "戴吸头"),
+            "Pick Up Tip", "戴吸头",
             command=self.on_pick_tip,
-        ).grid(row=2, column=0, columnspan=2, padx=4, pady=8)
+        )
+        self.btn_pick_tip.grid(row=2, column=0, columnspan=2, padx=4, pady=8)
 
         # 扔 tip
-        frm_drop = ttk.LabelFrame(frm, text=self._l("Drop Tip", "扔吸头"))
+        frm_drop = self._mk_labelframe(frm, "Drop Tip", "扔吸头")
         frm_drop.grid(row=0, column=1, padx=8, pady=8, sticky="nsew")
 
-        ttk.Label(frm_drop, text=self._l("Waste Slot:", "废槽位:")).grid(
+        self._mk_label(frm_drop, "Waste Slot:", "废槽位:").grid(
             row=0, column=0, padx=4, pady=4, sticky="e"
         )
-        self.var_waste_slot = tk.StringVar(value="2")
+        self.var_waste_slot = self._var("waste_slot", "2")
         ttk.Entry(frm_drop, textvariable=self.var_waste_slot, width=6).grid(
             row=0, column=1, padx=4, pady=4
         )
 
-        ttk.Label(frm_drop, text=self._l("Edge:", "方向:")).grid(
+        self._mk_label(frm_drop, "Edge:", "方向:").grid(
             row=1, column=0, padx=4, pady=4, sticky="e"
         )
-        self.var_edge = tk.StringVar(value="left")
+        self.var_edge = self._var("edge", "left")
         cmb_edge = ttk.Combobox(
             frm_drop,
             textvariable=self.var_edge,
@@ -210,11 +490,12 @@ class PipetteGUI:
         )
         cmb_edge.grid(row=1, column=1, padx=4, pady=4)
 
-        ttk.Button(
+        self.btn_drop_tip = self._mk_button(
             frm_drop,
-            text=self._l("Scrape Tip", "去除吸头"),
+            "Scrape Tip", "去除吸头",
             command=self.on_drop_tip,
-        ).grid(row=2, column=0, columnspan=2, padx=4, pady=8)
+        )
+        self.btn_drop_tip.grid(row=2, column=0, columnspan=2, padx=4, pady=8)
 
         frm.columnconfigure(0, weight=1)
         frm.columnconfigure(1, weight=1)
@@ -222,23 +503,20 @@ class PipetteGUI:
     # ==================================================
     # Tab2：Work（移液 + 坐标/Jog）
     # ==================================================
-    def _build_tab_work(self, nb: ttk.Notebook) -> None:
-        frm = ttk.Frame(nb)
-        nb.add(frm, text=self._l("Work", "移液 / 坐标"))
-
+    def _build_tab_work(self, frm: ttk.Frame) -> None:
         # 左侧：移液
-        frm_transfer = ttk.LabelFrame(frm, text=self._l("Transfer", "移液"))
+        frm_transfer = self._mk_labelframe(frm, "Transfer", "移液")
         frm_transfer.grid(row=0, column=0, padx=8, pady=8, sticky="nsew")
 
-        ttk.Label(frm_transfer, text=self._l("Src Slot:", "源槽位:")).grid(
+        self._mk_label(frm_transfer, "Src Slot:", "源槽位:").grid(
             row=0, column=0, padx=4, pady=2, sticky="e"
         )
-        ttk.Label(frm_transfer, text=self._l("Src Well:", "源孔:")).grid(
+        self._mk_label(frm_transfer, "Src Well:", "源孔:").grid(
             row=1, column=0, padx=4, pady=2, sticky="e"
         )
 
-        self.var_src_slot = tk.StringVar(value="4")
-        self.var_src_well = tk.StringVar(value="A1")
+        self.var_src_slot = self._var("src_slot", "4")
+        self.var_src_well = self._var("src_well", "A1")
 
         ttk.Entry(frm_transfer, textvariable=self.var_src_slot, width=6).grid(
             row=0, column=1, padx=4, pady=2
@@ -247,15 +525,15 @@ class PipetteGUI:
             row=1, column=1, padx=4, pady=2
         )
 
-        ttk.Label(frm_transfer, text=self._l("Dst Slot:", "目标槽位:")).grid(
+        self._mk_label(frm_transfer, "Dst Slot:", "目标槽位:").grid(
             row=0, column=2, padx=4, pady=2, sticky="e"
         )
-        ttk.Label(frm_transfer, text=self._l("Dst Well:", "目标孔:")).grid(
+        self._mk_label(frm_transfer, "Dst Well:", "目标孔:").grid(
             row=1, column=2, padx=4, pady=2, sticky="e"
         )
 
-        self.var_dst_slot = tk.StringVar(value="4")
-        self.var_dst_well = tk.StringVar(value="B3")
+        self.var_dst_slot = self._var("dst_slot", "4")
+        self.var_dst_well = self._var("dst_well", "B3")
 
         ttk.Entry(frm_transfer, textvariable=self.var_dst_slot, width=6).grid(
             row=0, column=3, padx=4, pady=2
@@ -264,60 +542,44 @@ class PipetteGUI:
             row=1, column=3, padx=4, pady=2
         )
 
-        ttk.Label(frm_transfer, text=self._l("Volume (µL):", "体积 (µL):")).grid(
+        self._mk_label(frm_transfer, "Volume (µL):", "体积 (µL):").grid(
             row=2, column=0, padx=4, pady=4, sticky="e"
         )
-        self.var_volume = tk.StringVar(value="50.0")
+        self.var_volume = self._var("volume", "50.0")
         ttk.Entry(frm_transfer, textvariable=self.var_volume, width=8).grid(
             row=2, column=1, padx=4, pady=4
         )
 
-        ttk.Button(
+        self.btn_transfer = self._mk_button(
             frm_transfer,
-            text=self._l("Transfer", "执行移液"),
+            "Transfer", "执行移液",
             command=self.on_transfer,
-        ).grid(row=3, column=0, columnspan=4, padx=4, pady=8)
+        )
+        self.btn_transfer.grid(row=3, column=0, columnspan=4, padx=4, pady=8)
 
         # 右侧：坐标 + Jog
-        frm_pos = ttk.LabelFrame(frm, text=self._l("Position (M114)", "坐标 (M114)"))
+        frm_pos = self._mk_labelframe(frm, "Position (M114)", "坐标 (M114)")
         frm_pos.grid(row=0, column=1, padx=8, pady=8, sticky="nsew")
 
-        self.var_pos_x = tk.StringVar(value="0.0")
-        self.var_pos_y = tk.StringVar(value="0.0")
-        self.var_pos_z = tk.StringVar(value="0.0")
-        self.var_pos_u = tk.StringVar(value="0.0")
-
-        ttk.Label(frm_pos, text="X:").grid(row=0, column=0, padx=4, pady=2, sticky="e")
-        ttk.Label(frm_pos, text="Y:").grid(row=1, column=0, padx=4, pady=2, sticky="e")
-        ttk.Label(frm_pos, text="Z:").grid(row=2, column=0, padx=4, pady=2, sticky="e")
-        ttk.Label(frm_pos, text="U:").grid(row=3, column=0, padx=4, pady=2, sticky="e")
-
-        ttk.Entry(frm_pos, textvariable=self.var_pos_x, width=10, state="readonly").grid(
-            row=0, column=1, padx=4, pady=2
-        )
-        ttk.Entry(frm_pos, textvariable=self.var_pos_y, width=10, state="readonly").grid(
-            row=1, column=1, padx=4, pady=2
-        )
-        ttk.Entry(frm_pos, textvariable=self.var_pos_z, width=10, state="readonly").grid(
-            row=2, column=1, padx=4, pady=2
-        )
-        ttk.Entry(frm_pos, textvariable=self.var_pos_u, width=10, state="readonly").grid(
-            row=3, column=1, padx=4, pady=2
-        )
+        # 四个轴共用一个等宽 Label，刷新时只更新一次
+        self.var_pos_all = tk.StringVar(value=self._format_pos(self._pos))
+        ttk.Label(
+            frm_pos, textvariable=self.var_pos_all, font="TkFixedFont", justify="left"
+        ).grid(row=0, column=0, rowspan=4, columnspan=2, padx=4, pady=2, sticky="w")
 
-        ttk.Button(
+        self._mk_button(
             frm_pos,
-            text=self._l("Refresh", "刷新"),
+            "Refresh", "刷新",
             command=self.on_refresh_position,
         ).grid(row=4, column=0, columnspan=2, padx=4, pady=4)
 
-        frm_jog = ttk.LabelFrame(frm_pos, text=self._l("Jog", "Jog 控制"))
+        frm_jog = self._mk_labelframe(frm_pos, "Jog", "Jog 控制")
         frm_jog.grid(row=0, column=2, rowspan=5, padx=8, pady=4, sticky="nsew")
 
-        ttk.Label(frm_jog, text=self._l("Step (mm):", "步长 (mm):")).grid(
+        self._mk_label(frm_jog, "Step (mm):", "步长 (mm):").grid(
             row=0, column=0, padx=4, pady=2, sticky="e"
         )
-        self.var_jog_step = tk.StringVar(value="1.0")
+        self.var_jog_step = self._var("jog_step", "1.0")
         cmb_step = ttk.Combobox(
             frm_jog,
             textvariable=self.var_jog_step,
@@ -327,32 +589,10 @@ class PipetteGUI:
         )
         cmb_step.grid(row=0, column=1, padx=4, pady=2)
 
-        ttk.Button(frm_jog, text="Y+", command=lambda: self.on_jog(0, +1, 0, 0)).grid(
-            row=1, column=1, padx=4, pady=2
-        )
-        ttk.Button(frm_jog, text="Y-", command=lambda: self.on_jog(0, -1, 0, 0)).grid(
-            row=3, column=1, padx=4, pady=2
-        )
-        ttk.Button(frm_jog, text="X-", command=lambda: self.on_jog(-1, 0, 0, 0)).grid(
-            row=2, column=0, padx=4, pady=2
-        )
-        ttk.Button(frm_jog, text="X+", command=lambda: self.on_jog(+1, 0, 0, 0)).grid(
-            row=2, column=2, padx=4, pady=2
-        )
-
-        ttk.Button(frm_jog, text="Z+", command=lambda: self.on_jog(0, 0, +1, 0)).grid(
-            row=1, column=3, padx=4, pady=2
-        )
-        ttk.Button(frm_jog, text="Z-", command=lambda: self.on_jog(0, 0, -1, 0)).grid(
-            row=3, column=3, padx=4, pady=2
-        )
-
-        ttk.Button(frm_jog, text="U+", command=lambda: self.on_jog(0, 0, 0, +1)).grid(
-            row=1, column=4, padx=4, pady=2
-        )
-        ttk.Button(frm_jog, text="U-", command=lambda: self.on_jog(0, 0, 0, -1)).grid(
-            row=3, column=4, padx=4, pady=2
-        )
+        for name, (row, col) in _JOG_GRID.items():
+            ttk.Button(frm_jog, text=name, command=partial(self.on_jog, name)).grid(
+                row=row, column=col, padx=4, pady=2
+            )
 
         frm.columnconfigure(0, weight=1)
         frm.columnconfigure(1, weight=1)
@@ -360,107 +600,71 @@ class PipetteGUI:
     # ==================================================
     # Tab3：Protocol（含 aspirate / dispense）
     # ==================================================
-    def _build_tab_protocol(self, nb: ttk.Notebook) -> None:
-        frm = ttk.Frame(nb)
-        nb.add(frm, text=self._l("Protocol", "协议"))
-
-        ttk.Label(frm, text=self._l("Step Type:", "步骤类型:")).grid(
+    def _build_tab_protocol(self, frm: ttk.Frame) -> None:
+        self._mk_label(frm, "Step Type:", "步骤类型:").grid(
             row=0, column=0, padx=4, pady=2, sticky="e"
         )
-        self.var_step_type = tk.StringVar(value="transfer")
+        self.var_step_type = self._var("step_type", "transfer")
         cmb_type = ttk.Combobox(
             frm,
             textvariable=self.var_step_type,
-            values=[
-                "home_xyz",
-                "pick_tip",
-                "drop_tip",
-                "transfer",
-                "aspirate",
-                "dispense",
-                "dwell",
-            ],
+            values=list(STEP_TYPES),
             width=12,
             state="readonly",
         )
         cmb_type.grid(row=0, column=1, padx=4, pady=2)
 
-        ttk.Label(frm, text=self._l("Params (JSON):", "参数 (JSON):")).grid(
+        self._mk_label(frm, "Params (JSON):", "参数 (JSON):").grid(
             row=1, column=0, padx=4, pady=2, sticky="ne"
         )
         self.txt_step_params = tk.Text(frm, height=6, width=52)
         self.txt_step_params.grid(row=1, column=1, columnspan=3, padx=4, pady=2)
 
-        if self.current_lang == "en":
-            example = (
-                "Examples:\n"
-                "transfer: {\"src_slot\":\"4\",\"src_well\":\"A1\","
-                "\"dst_slot\":\"4\",\"dst_well\":\"B3\",\"volume_ul\":50}\n"
-                "pick_tip: {\"slot\":\"1\",\"well\":\"A1\"}\n"
-                "drop_tip: {\"slot\":\"2\",\"edge\":\"left\"}\n"
-                "aspirate well: {\"slot\":\"4\",\"well\":\"A1\",\"volume_ul\":50}\n"
-                "aspirate XY:   {\"z_safe\":152.0,\"z_aspirate\":158.0,\"volume_ul\":50}\n"
-                "dispense well: {\"slot\":\"4\",\"well\":\"B3\",\"volume_ul\":50}\n"
-                "dispense XY:   {\"z_safe\":152.0,\"z_dispense\":158.0,\"volume_ul\":50}\n"
-                "dwell: {\"seconds\":2.0}"
-            )
-        else:
-            example = (
-                "示例:\n"
-                "transfer: {\"src_slot\":\"4\",\"src_well\":\"A1\","
-                "\"dst_slot\":\"4\",\"dst_well\":\"B3\",\"volume_ul\":50}\n"
-                "pick_tip: {\"slot\":\"1\",\"well\":\"A1\"}\n"
-                "drop_tip: {\"slot\":\"2\",\"edge\":\"left\"}\n"
-                "aspirate 孔位: {\"slot\":\"4\",\"well\":\"A1\",\"volume_ul\":50}\n"
-                "aspirate 当前XY: {\"z_safe\":152.0,\"z_aspirate\":158.0,\"volume_ul\":50}\n"
-                "dispense 孔位: {\"slot\":\"4\",\"well\":\"B3\",\"volume_ul\":50}\n"
-                "dispense 当前XY: {\"z_safe\":152.0,\"z_dispense\":158.0,\"volume_ul\":50}\n"
-                "dwell: {\"seconds\":2.0}"
-            )
-
-        ttk.Label(frm, text=example, justify="left").grid(
+        self._mk_label(frm, _EXAMPLE_EN, _EXAMPLE_ZH, justify="left").grid(
             row=2, column=0, columnspan=4, padx=4, pady=2, sticky="w"
         )
 
-        ttk.Label(frm, text=self._l("Steps:", "步骤列表:")).grid(
+        self._mk_label(frm, "Steps:", "步骤列表:").grid(
             row=3, column=0, padx=4, pady=2, sticky="w"
         )
         self.lst_steps = tk.Listbox(frm, height=8, width=70)
         self.lst_steps.grid(row=4, column=0, columnspan=4, padx=4, pady=2, sticky="nsew")
 
-        # 语言切换时重建列表
-        for i, step in enumerate(self.protocol_steps, start=1):
-            self.lst_steps.insert("end", f"{i:02d}. {step.get('type')} {step.get('params')}")
+        # 步骤列表与语言无关，不登记到 _i18n_widgets，切换语言时保持不动
 
-        ttk.Button(
+        self._mk_button(
             frm,
-            text=self._l("Add Step", "添加步骤"),
+            "Add Step", "添加步骤",
             command=self.on_add_step,
         ).grid(row=5, column=0, padx=4, pady=4)
 
-        ttk.Button(
+        self._mk_button(
             frm,
-            text=self._l("Delete Selected", "删除选中"),
+            "Delete Selected", "删除选中",
             command=self.on_delete_step,
         ).grid(row=5, column=1, padx=4, pady=4)
 
-        ttk.Button(
+        self._mk_button(
             frm,
-            text=self._l("Save Protocol", "保存协议"),
+            "Save Protocol", "保存协议",
             command=self.on_save_protocol,
         ).grid(row=5, column=2, padx=4, pady=4)
 
-        ttk.Button(
+        self._mk_button(
             frm,
-            text=self._l("Load Protocol", "载入协议"),
+            "Load Protocol", "载入协议",
             command=self.on_load_protocol,
         ).grid(row=5, column=3, padx=4, pady=4)
 
-        ttk.Button(
+        self.btn_run_protocol = self._mk_button(
             frm,
-            text=self._l("Run Protocol", "执行协议"),
+            "Run Protocol", "执行协议",
             command=self.on_run_protocol,
-        ).grid(row=6, column=0, columnspan=4, padx=4, pady=6)
+        )
+        self.btn_run_protocol.grid(row=6, column=0, columnspan=4, padx=4, pady=6)
+
+        self.pb_protocol = ttk.Progressbar(frm, mode="determinate")
+        self.pb_protocol.grid(row=7, column=0, columnspan=4, padx=4, pady=(0, 6), sticky="ew")
 
         frm.rowconfigure(4, weight=1)
         frm.columnconfigure(1, weight=1)
@@ -470,19 +674,150 @@ class PipetteGUI:
     # 工具函数
     # ==================================================
     def log(self, text: str) -> None:
-        self.txt_log.insert("end", text + "\n")
+        self._log_pending.append(text)
+        if not self._log_flush_scheduled:
+            self._log_flush_scheduled = True
+            self.root.after(self.FLUSH_MS, self._flush_log)
+
+    def _flush_log(self) -> None:
+        """把缓存的日志行一次性写入日志框。"""
+        self._log_flush_scheduled = False
+        if not self._log_pending:
+            return
+        joined = "\n".join(self._log_pending)
+        self._log_pending.clear()
+        self.txt_log.insert("end", joined + "\n")
+        self._log_file.write(joined + "\n")
+        self._log_file.flush()
+
+        lines = int(self.txt_log.index("end-1c").split(".")[0])
+        if lines > self.LOG_MAX:
+            keep = self.LOG_MAX - self.LOG_TRIM
+            self.txt_log.delete("1.0", f"{lines - keep}.0")
         self.txt_log.see("end")
-        self.root.update_idletasks()
+
+    def on_save_log(self) -> None:
+        """把本次运行的完整日志（不受日志框行数限制）另存为文件。"""
+        try:
+            filename = filedialog.asksaveasfilename(
+                title=self._STR["save_log"],
+                defaultextension=".txt",
+                filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            )
+            if not filename:
+                return
+            self._flush_log()
+            shutil.copyfile(self._log_file.name, filename)
+            self.log(f"Log saved to {filename}")
+        except Exception as e:
+            self._report_error("Save log", e)
+
+    @staticmethod
+    def _readonly_text(txt: tk.Text) -> tk.Text:
+        """
+        让 Text 对用户只读，但程序仍可直接 insert / delete，
+        不必每次写入前后切换 state。Ctrl 组合键（复制、全选）照常可用。
+        """
+        nav_keys = {"Left", "Right", "Up", "Down", "Prior", "Next", "Home", "End"}
+        ctrl_keys = {"c", "a", "slash", "Insert"}   # 复制 / 全选
+
+        def block_key(event: tk.Event) -> str | None:
+            if event.keysym in nav_keys:
+                return None
+            if event.state & 0x4 and event.keysym in ctrl_keys:   # Control
+                return None
+            return "break"
+
+        txt.bind("<Key>", block_key)
+        for seq in ("<<Paste>>", "<<Cut>>", "<<Clear>>", "<<PasteSelection>>"):
+            txt.bind(seq, lambda e: "break")
+        return txt
 
     def require_robot(self) -> Robot:
         if self.robot is None or self.deck is None:
-            messagebox.showerror(
-                self._l("Error", "错误"),
-                self._l("Robot not connected.", "未连接机器人。"),
-            )
-            raise RuntimeError("Robot not connected.")
+            raise RuntimeError(self._STR["not_connected"])
         return self.robot
 
+    def _submit(
+        self,
+        fn,
+        on_done,
+        btn: ttk.Button | None = None,
+        executor: concurrent.futures.Executor | None = None,
+    ) -> None:
+        """
+        在工作线程中执行 fn，完成后回到 Tk 主线程调用 on_done(future)。
+
+        执行期间禁用触发按钮，防止重复点击。
+        executor 默认为串口工作线程 self._worker。
+        """
+        if btn is not None:
+            btn.state(["disabled"])
+
+        def _done(fut: concurrent.futures.Future) -> None:
+            if btn is not None:
+                btn.state(["!disabled"])
+            on_done(fut)
+
+        fut = (executor or self._worker).submit(fn)
+        fut.add_done_callback(lambda f: self._post(_done, f))
+
+    def _post(self, fn, *args) -> None:
+        """从工作线程把 fn(*args) 投递到 Tk 主线程；窗口关闭后静默丢弃。"""
+        if self._closing:
+            return
+        try:
+            self.root.after(0, fn, *args)
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def _notify_error(self, msg: str) -> None:
+        """在状态栏显示错误（3 秒后清除）并写入日志，不弹模态框。"""
+        self.var_status.set(msg)
+        if self._status_clear_id is not None:
+            self.root.after_cancel(self._status_clear_id)
+        self._status_clear_id = self.root.after(3000, self._clear_status)
+        self.log(f"[ERROR] {msg}")
+
+    def _clear_status(self) -> None:
+        self._status_clear_id = None
+        self.var_status.set("")
+
+    def _report_error(self, what: str, e: BaseException) -> None:
+        self._notify_error(f"{what} failed: {e}")
+
+    def _task_done(self, fut: concurrent.futures.Future, what: str, done_msg: str) -> None:
+        e = fut.exception()
+        if e is not None:
+            self._report_error(what, e)
+        else:
+            self.log(done_msg)
+
+    def _var(self, key: str, value: str) -> tk.StringVar:
+        """创建 StringVar 并登记到 self._vars。"""
+        var = tk.StringVar(value=value)
+        self._vars[key] = var
+        return var
+
+    def snapshot(self, keys: tuple[str, ...]) -> dict[str, str]:
+        """一次性读取多个输入框的当前值（已去除首尾空白）。"""
+        return {k: self._vars[k].get().strip() for k in keys}
+
+    def _step_display(self, i: int, step: dict) -> str:
+        """
+        返回步骤在列表中的显示文本，并缓存在 step["_display"] 中，
+        避免每次重建列表都重新格式化 params。
+        """
+        text = step.get("_display")
+        if text is None:
+            text = f"{i:02d}. {step.get('type')} {step.get('params')}"
+            step["_display"] = text
+        return text
+
+    @staticmethod
+    def _format_pos(pos: dict[str, float]) -> str:
+        return "\n".join(f"{axis}: {val:10.3f}" for axis, val in pos.items())
+
     def _get_jog_step(self) -> float:
         try:
             return float(self.var_jog_step.get())
@@ -493,46 +828,81 @@ class PipetteGUI:
     # 连接 / 回零
     # ==================================================
     def on_connect(self) -> None:
-        try:
-            port = self.var_port.get().strip()
-            self.robot = Robot(port)
+        """打开串口在工作线程中进行（会阻塞到固件启动完成），结束后回主线程登记。"""
+        vals = self.snapshot(("port", "syringe"))
+        port = vals["port"]
+        syringe_name = vals["syringe"]
+        # 先断开旧连接，否则旧的接收线程还在读串口，会抢走新连接的 'ok'
+        old, self.robot, self.deck = self.robot, None, None
+
+        def _connect() -> Robot:
+            if old is not None:
+                try:
+                    old.disconnect()
+                except Exception:
+                    pass
+            robot = Robot(port)
+            try:
+                robot.set_syringe(syringe_name)
+            except Exception:
+                robot.disconnect()
+                raise
+            if self._closing:
+                # 连接期间窗口已关闭：_on_close 看不到这个新连接，这里自己断开
+                robot.disconnect()
+                raise RuntimeError("window closed")
+            return robot
+
+        def _done(fut: concurrent.futures.Future) -> None:
+            e = fut.exception()
+            if e is not None:
+                self._report_error("Connect", e)
+                return
+            self.robot = fut.result()
             self.deck = Deck()
-            syringe_name = self.var_syringe.get()
-            self.robot.set_syringe(syringe_name)
             self.log(f"Connected to {port}, syringe={syringe_name}")
-        except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Connect failed: {e}")
-            self.log(f"[ERROR] Connect failed: {e}")
+
+        self._submit(_connect, _done, self.btn_connect)
 
     def on_disconnect(self) -> None:
-        if self.robot is not None:
-            try:
-                self.robot.disconnect()
-                self.log("Disconnected.")
-            except Exception as e:
+        robot, self.robot, self.deck = self.robot, None, None
+        if robot is None:
+            return
+
+        def _done(fut: concurrent.futures.Future) -> None:
+            e = fut.exception()
+            if e is not None:
                 self.log(f"[WARN] Disconnect error: {e}")
-        self.robot = None
-        self.deck = None
+            else:
+                self.log("Disconnected.")
+
+        self._submit(robot.disconnect, _done, self.btn_disconnect)
 
     def on_home_xyz(self) -> None:
         try:
             robot = self.require_robot()
-            self.log("Homing XYZ...")
-            robot.home("XYZ", timeout=9999.0)
-            self.log("Homing XYZ done.")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Homing XYZ failed: {e}")
-            self.log(f"[ERROR] Homing XYZ: {e}")
+            self._report_error("Homing XYZ", e)
+            return
+        self.log("Homing XYZ...")
+        self._submit(
+            lambda: robot.home("XYZ", timeout=9999.0),
+            lambda fut: self._task_done(fut, "Homing XYZ", "Homing XYZ done."),
+            self.btn_home_xyz,
+        )
 
     def on_home_all(self) -> None:
         try:
             robot = self.require_robot()
-            self.log("Homing all axes...")
-            robot.home_all(timeout=9999.0)
-            self.log("Homing all axes done.")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Homing all failed: {e}")
-            self.log(f"[ERROR] Homing all: {e}")
+            self._report_error("Homing all", e)
+            return
+        self.log("Homing all axes...")
+        self._submit(
+            lambda: robot.home_all(timeout=9999.0),
+            lambda fut: self._task_done(fut, "Homing all", "Homing all axes done."),
+            self.btn_home_all,
+        )
 
     # ==================================================
     # Tip 操作
@@ -540,26 +910,36 @@ class PipetteGUI:
     def on_pick_tip(self) -> None:
         try:
             robot = self.require_robot()
-            slot_id = self.var_tip_slot.get().strip()
-            well = self.var_tip_well.get().strip()
-            self.log(f"Pick tip: slot={slot_id}, well={well}")
-            robot.pick_up_tip(self.deck, slot_id=slot_id, well=well)
-            self.log("Pick tip done.")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Pick tip failed: {e}")
-            self.log(f"[ERROR] Pick tip: {e}")
+            self._report_error("Pick tip", e)
+            return
+        deck = self.deck
+        vals = self.snapshot(("tip_slot", "tip_well"))
+        slot_id = vals["tip_slot"]
+        well = vals["tip_well"]
+        self.log(f"Pick tip: slot={slot_id}, well={well}")
+        self._submit(
+            lambda: robot.pick_up_tip(deck, slot_id=slot_id, well=well),
+            lambda fut: self._task_done(fut, "Pick tip", "Pick tip done."),
+            self.btn_pick_tip,
+        )
 
     def on_drop_tip(self) -> None:
         try:
             robot = self.require_robot()
-            slot_id = self.var_waste_slot.get().strip()
-            edge = self.var_edge.get()
-            self.log(f"Drop tip: slot={slot_id}, edge={edge}")
-            robot.drop_tip_scrape(self.deck, slot_id=slot_id, edge=edge)
-            self.log("Drop tip done.")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Drop tip failed: {e}")
-            self.log(f"[ERROR] Drop tip: {e}")
+            self._report_error("Drop tip", e)
+            return
+        deck = self.deck
+        vals = self.snapshot(("waste_slot", "edge"))
+        slot_id = vals["waste_slot"]
+        edge = vals["edge"]
+        self.log(f"Drop tip: slot={slot_id}, edge={edge}")
+        self._submit(
+            lambda: robot.drop_tip_scrape(deck, slot_id=slot_id, edge=edge),
+            lambda fut: self._task_done(fut, "Drop tip", "Drop tip done."),
+            self.btn_drop_tip,
+        )
 
     # ==================================================
     # 移液
@@ -567,80 +947,134 @@ class PipetteGUI:
     def on_transfer(self) -> None:
         try:
             robot = self.require_robot()
-            src_slot = self.var_src_slot.get().strip()
-            src_well = self.var_src_well.get().strip()
-            dst_slot = self.var_dst_slot.get().strip()
-            dst_well = self.var_dst_well.get().strip()
-            volume_ul = float(self.var_volume.get().strip())
-            syringe_name = self.var_syringe.get()
-
-            self.log(
-                f"Transfer {volume_ul} µL from {src_slot}.{src_well} "
-                f"to {dst_slot}.{dst_well} (syringe={syringe_name})"
+            deck = self.deck
+            vals = self.snapshot(
+                ("src_slot", "src_well", "dst_slot", "dst_well", "volume", "syringe")
             )
+            src_slot = vals["src_slot"]
+            src_well = vals["src_well"]
+            dst_slot = vals["dst_slot"]
+            dst_well = vals["dst_well"]
+            volume_ul = float(vals["volume"])
+            syringe_name = vals["syringe"]
+        except Exception as e:
+            self._report_error("Transfer", e)
+            return
+
+        self.log(
+            f"Transfer {volume_ul} µL from {src_slot}.{src_well} "
+            f"to {dst_slot}.{dst_well} (syringe={syringe_name})"
+        )
 
-            robot.transfer_volume(
-                self.deck,
+        self._submit(
+            lambda: robot.transfer_volume(
+                deck,
                 src_slot=src_slot,
                 src_well=src_well,
                 dst_slot=dst_slot,
                 dst_well=dst_well,
                 volume_ul=volume_ul,
                 syringe=syringe_name,
-            )
-            self.log("Transfer done.")
-        except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Transfer failed: {e}")
-            self.log(f"[ERROR] Transfer: {e}")
+            ),
+            lambda fut: self._task_done(fut, "Transfer", "Transfer done."),
+            self.btn_transfer,
+        )
 
     # ==================================================
     # 坐标 / Jog
     # ==================================================
     def on_refresh_position(self) -> None:
+        """连续点击只在最后一次点击 50 ms 后读取一次坐标。"""
+        if self._pending_refresh is not None:
+            self.root.after_cancel(self._pending_refresh)
+        self._pending_refresh = self.root.after(50, self._do_refresh)
+
+    def _do_refresh(self) -> None:
+        self._pending_refresh = None
         try:
             robot = self.require_robot()
-            pos = robot.get_position()
-            if not pos:
-                self.log("[WARN] No position data received.")
-                return
-
-            self.var_pos_x.set(f"{pos.get('X', 0.0):.3f}")
-            self.var_pos_y.set(f"{pos.get('Y', 0.0):.3f}")
-            self.var_pos_z.set(f"{pos.get('Z', 0.0):.3f}")
-            self.var_pos_u.set(f"{pos.get('U', 0.0):.3f}")
-            self.log(f"Position: {pos}")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Get position failed: {e}")
-            self.log(f"[ERROR] Get position: {e}")
+            self._report_error("Get position", e)
+            return
+        self._submit(robot.get_position, self._refresh_done)
 
+    def _refresh_done(self, fut: concurrent.futures.Future) -> None:
+        e = fut.exception()
+        if e is not None:
+            self._report_error("Get position", e)
+            return
+        pos = fut.result()
+        if not pos:
+            self.log("[WARN] No position data received.")
+            return
 
-    def on_jog(self, sx: int, sy: int, sz: int, su: int) -> None:
+        for axis in self._pos:
+            self._pos[axis] = pos.get(axis, 0.0)
+        self.var_pos_all.set(self._format_pos(self._pos))
+        self.log(f"Position: {pos}")
+
+    def on_jog(self, name: str) -> None:
+        """
+        name 为 _JOG_DIRS 中的按钮名（如 "X+"）。
+        累加本次点击的位移，最后一次点击 20 ms 后合并成一条 move_relative。
+        上一次 Jog 还没执行完时继续累加，完成后再发送。
+        """
+        try:
+            self.require_robot()
+        except Exception as e:
+            self._report_error("Jog", e)
+            return
+        sx, sy, sz, su = _JOG_DIRS[name]
+        step = self._get_jog_step()
+        acc = self._jog_accum
+        acc[0] += sx * step
+        acc[1] += sy * step
+        acc[2] += sz * step
+        acc[3] += su * step
+
+        if self._pending_jog is not None:
+            self.root.after_cancel(self._pending_jog)
+        self._pending_jog = self.root.after(20, self._flush_jog)
+
+    def _flush_jog(self) -> None:
+        self._pending_jog = None
+        if self._jog_busy:
+            # 等当前移动完成后由 _jog_done 再发送
+            return
+        dx, dy, dz, du = self._jog_accum
+        self._jog_accum = [0.0, 0.0, 0.0, 0.0]
+        if dx == 0 and dy == 0 and dz == 0 and du == 0:
+            return
         try:
             robot = self.require_robot()
-            step = self._get_jog_step()
-
-            dx = sx * step
-            dy = sy * step
-            dz = sz * step
-            du = su * step
-
-            # 根据移动的轴自动选择速度
-            if sx != 0 or sy != 0:
-                feed = 3000.0      # XY 轴速度
-            elif sz != 0:
-                feed = 1000.0      # Z 轴速度
-            elif su != 0:
-                feed = 200.0       # U 轴速度
-            else:
-                feed = 1000.0      # fallback
+        except Exception as e:
+            self._report_error("Jog", e)
+            return
 
-            self.log(f"Jog: dX={dx}, dY={dy}, dZ={dz}, dU={du}, F={feed}")
-            robot.move_relative(dx=dx, dy=dy, dz=dz, du=du, feedrate=feed)
+        # 根据移动的轴自动选择速度
+        if dx != 0 or dy != 0:
+            feed = 3000.0      # XY 轴速度
+        elif dz != 0:
+            feed = 1000.0      # Z 轴速度
+        else:
+            feed = 200.0       # U 轴速度
 
-        except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Jog failed: {e}")
-            self.log(f"[ERROR] Jog: {e}")
+        self.log(f"Jog: dX={dx}, dY={dy}, dZ={dz}, dU={du}, F={feed}")
+        self._jog_busy = True
+        self._submit(
+            lambda: robot.move_relative(dx=dx, dy=dy, dz=dz, du=du, feedrate=feed),
+            self._jog_done,
+        )
 
+    def _jog_done(self, fut: concurrent.futures.Future) -> None:
+        self._jog_busy = False
+        e = fut.exception()
+        if e is not None:
+            self._jog_accum = [0.0, 0.0, 0.0, 0.0]
+            self._report_error("Jog", e)
+            return
+        if any(self._jog_accum) and self._pending_jog is None:
+            self._flush_jog()
 
     # ==================================================
     # 协议
@@ -649,16 +1083,21 @@ class PipetteGUI:
         try:
             step_type = self.var_step_type.get()
             raw = self.txt_step_params.get("1.0", "end").strip()
-            params = json.loads(raw) if raw else {}
+            params = _loads(raw) if raw else {}
+            validate_step(step_type, params)
             step = {"type": step_type, "params": params}
-            self.protocol_steps.append(step)
-            self.lst_steps.insert("end", f"{len(self.protocol_steps):02d}. {step_type} {params}")
             self.log(f"Added step: {step}")
+            self.protocol_steps.append(step)
+            self._protocol_version += 1
+            self.lst_steps.insert(
+                "end", self._step_display(len(self.protocol_steps), step)
+            )
         except json.JSONDecodeError as e:
-            messagebox.showerror(self._l("Error", "错误"), f"JSON parse error: {e}")
+            self._notify_error(f"JSON parse error: {e}")
+        except ValueError as e:
+            self._notify_error(f"Invalid params: {e}")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Add step failed: {e}")
-            self.log(f"[ERROR] Add step: {e}")
+            self._report_error("Add step", e)
 
     def on_delete_step(self) -> None:
         try:
@@ -668,199 +1107,150 @@ class PipetteGUI:
             index = sel[0]
             self.lst_steps.delete(index)
             del self.protocol_steps[index]
+            self._protocol_version += 1
+
+            # 只改写被删除行之后的序号，前面的行保持不动
+            rows = []
+            for i in range(index, len(self.protocol_steps)):
+                step = self.protocol_steps[i]
+                rest = self._step_display(i + 2, step).split(". ", 1)[1]
+                step["_display"] = f"{i + 1:02d}. {rest}"
+                rows.append(step["_display"])
+            if rows:
+                self.lst_steps.delete(index, "end")
+                self.lst_steps.insert("end", *rows)
             self.log(f"Deleted step #{index + 1}")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Delete step failed: {e}")
-            self.log(f"[ERROR] Delete step: {e}")
+            self._report_error("Delete step", e)
 
     def on_save_protocol(self) -> None:
         try:
             filename = filedialog.asksaveasfilename(
-                title=self._l("Save Protocol", "保存协议"),
+                title=self._STR["save_protocol"],
                 defaultextension=".json",
                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
             )
             if not filename:
                 return
+            # 下划线开头的是界面缓存字段，不写入文件
+            steps = [
+                {k: v for k, v in step.items() if not k.startswith("_")}
+                for step in self.protocol_steps
+            ]
             with open(filename, "w", encoding="utf-8") as f:
-                # 保留中文，不转义
-                json.dump(self.protocol_steps, f, indent=2, ensure_ascii=False)
+                f.write(_dumps(steps))
             self.log(f"Protocol saved to {filename}")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Save protocol failed: {e}")
-            self.log(f"[ERROR] Save protocol: {e}")
+            self._report_error("Save protocol", e)
 
     def on_load_protocol(self) -> None:
         try:
             filename = filedialog.askopenfilename(
-                title=self._l("Load Protocol", "载入协议"),
+                title=self._STR["load_protocol"],
                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
             )
             if not filename:
                 return
             with open(filename, "r", encoding="utf-8") as f:
-                self.protocol_steps = json.load(f)
+                steps = _loads(f.read())
+            for i, step in enumerate(steps, start=1):
+                try:
+                    validate_step(step.get("type"), step.get("params", {}) or {})
+                except ValueError as e:
+                    raise ValueError(f"step {i}: {e}") from None
+            self.protocol_steps = steps
+            self._protocol_version += 1
 
             # 刷新列表显示
             self.lst_steps.delete(0, "end")
-            for i, step in enumerate(self.protocol_steps, start=1):
-                self.lst_steps.insert(
-                    "end", f"{i:02d}. {step.get('type')} {step.get('params')}"
-                )
+            rows = [
+                self._step_display(i, step)
+                for i, step in enumerate(self.protocol_steps, start=1)
+            ]
+            if rows:
+                self.lst_steps.insert("end", *rows)
 
             self.log(f"Protocol loaded from {filename}")
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Load protocol failed: {e}")
-            self.log(f"[ERROR] Load protocol: {e}")
+            self._report_error("Load protocol", e)
 
-    def _run_single_step(self, step: dict) -> None:
+    def _get_runner(self, robot: Robot, deck: Deck, default_syringe: str) -> ProtocolRunner:
         """
-        执行单个协议步骤。
-
-        支持的 step type:
-        - home_xyz
-        - pick_tip
-        - drop_tip
-        - transfer
-        - aspirate
-        - dispense
-        - dwell
+        返回编译好的 ProtocolRunner。
+        步骤列表、机器人和默认注射器都没变时直接复用上次结果。
         """
-        robot = self.require_robot()
-        step_type = step.get("type")
-        params = step.get("params", {}) or {}
-
-        if step_type == "home_xyz":
-            robot.home("XYZ", timeout=9999.0)
-
-        elif step_type == "pick_tip":
-            slot = params["slot"]
-            well = params["well"]
-            robot.pick_up_tip(self.deck, slot_id=slot, well=well)
-
-        elif step_type == "drop_tip":
-            slot = params["slot"]
-            edge = params.get("edge", "left")
-            robot.drop_tip_scrape(self.deck, slot_id=slot, edge=edge)
-
-        elif step_type == "transfer":
-            p = params
-            syringe_name = p.get("syringe", self.var_syringe.get())
-            robot.transfer_volume(
-                self.deck,
-                src_slot=p["src_slot"],
-                src_well=p["src_well"],
-                dst_slot=p["dst_slot"],
-                dst_well=p["dst_well"],
-                volume_ul=float(p["volume_ul"]),
-                syringe=syringe_name,
+        key = (self._protocol_version, id(robot), id(deck), default_syringe)
+        if key != self._runner_key:
+            self._runner = ProtocolRunner(
+                robot, deck, self.protocol_steps, default_syringe, cancel=self._cancel
             )
-
-        elif step_type == "aspirate":
-            p = params
-            syringe_name = p.get("syringe", self.var_syringe.get())
-            volume_ul = float(p["volume_ul"])
-
-            slot = p.get("slot")
-            well = p.get("well")
-        
-            if slot is None:
-                raise ValueError("aspirate 步骤需要提供 slot。")
-
-            if well is not None:
-                # 情况 1：slot + well → 使用 48wells
-                robot.aspirate(
-                    volume_ul=volume_ul,
-                    syringe=syringe_name,
-                    deck=self.deck,
-                    slot_id=slot,
-                    well=well,
-                    # labware_type=默认 48 wells
-                )
-            else:
-                # 情况 2：slot + 无 well → 视为 beaker
-                    robot.aspirate_from_beaker(
-                    deck=self.deck,
-                    slot_id=slot,
-                    volume_ul=volume_ul,
-                    syringe=syringe_name,
-                )
-
-        elif step_type == "dispense":
-            p = params
-            syringe_name = p.get("syringe", self.var_syringe.get())
-            volume_ul = float(p["volume_ul"])
-
-            slot = p.get("slot")
-            well = p.get("well")
-
-            if slot is None:
-                raise ValueError("dispense 步骤需要提供 slot。")
-
-            if well is not None:
-                # 情况 1：slot + well → 使用 48wells
-                robot.dispense(
-                    volume_ul=volume_ul,
-                    syringe=syringe_name,
-                    deck=self.deck,
-                    slot_id=slot,
-                    well=well,
-                    # labware_type=默认 48 wells
-                )
-            else:
-                # 情况 2：slot + 无 well → 视为 beaker
-                    robot.dispense_to_beaker(
-                    deck=self.deck,
-                    slot_id=slot,
-                    volume_ul=volume_ul,
-                    syringe=syringe_name,
-                )
-
-        elif step_type == "dwell":
-            seconds = float(params.get("seconds", 1.0))
-            robot.dwell(seconds)
-
-        else:
-            raise ValueError(f"Unknown step type: {step_type}")
+            self._runner_key = key
+        return self._runner
 
     def on_run_protocol(self) -> None:
+        """执行协议；运行中再次点击同一按钮则在当前步骤结束后取消。"""
+        if self._protocol_running:
+            self._cancel.set()
+            self.log("Cancelling protocol after the current step...")
+            return
         try:
-            self.require_robot()
-            self.log("Running protocol...")
-            for idx, step in enumerate(self.protocol_steps, start=1):
-                self.log(f"Step {idx}: {step}")
-                self._run_single_step(step)
-            self.log("Protocol finished.")
+            robot = self.require_robot()
+            runner = self._get_runner(robot, self.deck, self.var_syringe.get())
         except Exception as e:
-            messagebox.showerror(self._l("Error", "错误"), f"Run protocol failed: {e}")
-            self.log(f"[ERROR] Run protocol: {e}")
+            self._report_error("Run protocol", e)
+            return
+        self._cancel.clear()
+        self._protocol_running = True
+        self._retext(self.btn_run_protocol, "Cancel", "取消")
+        self.pb_protocol.configure(maximum=max(len(runner), 1), value=0)
+        self.log("Running protocol...")
+
+        # 回调在工作线程中触发，通过 _post 回到主线程更新界面
+        self._submit(
+            lambda: runner.run(
+                on_step=lambda idx, text: self._post(self.log, text),
+                on_step_done=lambda idx: self._post(
+                    self.pb_protocol.configure, {"value": idx}
+                ),
+            ),
+            self._protocol_done,
+        )
 
-    def _build_tab_gpt_chat(self, nb: ttk.Notebook) -> None:
+    def _protocol_done(self, fut: concurrent.futures.Future) -> None:
+        self._protocol_running = False
+        self._retext(self.btn_run_protocol, "Run Protocol", "执行协议")
+        e = fut.exception()
+        if e is not None:
+            self._report_error("Run protocol", e)
+        elif fut.result():
+            self.log("Protocol finished.")
+        else:
+            self.log("Protocol cancelled.")
+
+    def _build_tab_gpt_chat(self, frm: ttk.Frame) -> None:
         """GPT 对话标签页：输入一段描述，调用云端 GPT 接口返回结果。"""
-        frm = ttk.Frame(nb)
-        nb.add(frm, text=self._l("GPT Helper", "GPT 助手"))
 
         # 输入框
-        lbl_in = ttk.Label(frm, text=self._l("Input:", "输入："))
+        lbl_in = self._mk_label(frm, "Input:", "输入：")
         lbl_in.grid(row=0, column=0, padx=4, pady=4, sticky="nw")
 
         self.txt_gpt_in = tk.Text(frm, height=4, width=60, wrap="word")
         self.txt_gpt_in.grid(row=0, column=1, padx=4, pady=4, sticky="nsew")
 
         # 输出框
-        lbl_out = ttk.Label(frm, text=self._l("Output:", "输出："))
+        lbl_out = self._mk_label(frm, "Output:", "输出：")
         lbl_out.grid(row=1, column=0, padx=4, pady=4, sticky="nw")
 
-        self.txt_gpt_out = tk.Text(frm, height=10, width=60, wrap="word", state="disabled")
+        self.txt_gpt_out = self._readonly_text(tk.Text(frm, height=10, width=60, wrap="word"))
         self.txt_gpt_out.grid(row=1, column=1, padx=4, pady=4, sticky="nsew")
 
         # 发送按钮
-        btn = ttk.Button(
+        self.btn_gpt_send = self._mk_button(
             frm,
-            text=self._l("Send to GPT", "发送到 GPT"),
+            "Send to GPT", "发送到 GPT",
             command=self.on_gpt_send,
         )
-        btn.grid(row=2, column=1, padx=4, pady=6, sticky="e")
+        self.btn_gpt_send.grid(row=2, column=1, padx=4, pady=6, sticky="e")
 
         # 让文本框自动拉伸
         frm.rowconfigure(0, weight=1)
@@ -871,44 +1261,132 @@ class PipetteGUI:
         """读取输入框内容，调用云端 GPT 接口，将结果显示在输出框。"""
         text = self.txt_gpt_in.get("1.0", "end").strip()
         if not text:
-            messagebox.showwarning(
-                self._l("Warning", "提示"),
-                self._l("Please enter text to send to GPT.", "请输入要发送给 GPT 的内容。"),
-            )
+            self._notify_error(self._STR["gpt_empty"])
             return
 
-        try:
-            self.log(self._l(f"[GPT] Request: {text}", f"[GPT] 请求：{text}"))
-            resp = requests.post(
-                GPT_API_URL,
-                json={"description": text},
-                timeout=300,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            answer = data.get(
-                "result",
-                self._l("(no 'result' field)", "(无 result 字段)"),
-            )
-        except Exception as e:
-            answer =  self._l(
-                f"[ERROR] Call GPT failed: {e}",
-                f"[ERROR] 调用 GPT 失败: {e}",
-            )
-            self.log(answer)
+        self.log(self._STR["gpt_request_fmt"].format(text=text))
 
-        # 显示到输出框
-        self.txt_gpt_out.configure(state="normal")
+        # 清空输出框，结果到达后逐段追加
         self.txt_gpt_out.delete("1.0", "end")
-        self.txt_gpt_out.insert("end", answer)
-        self.txt_gpt_out.configure(state="disabled")
 
+        self._submit(
+            lambda: self._gpt_call(text),
+            self._gpt_done,
+            self.btn_gpt_send,
+            executor=self._net_worker,
+        )
+
+    def _gpt_call(self, text: str) -> bool:
+        """
+        工作线程：以流式方式读取 GPT 接口返回。
+
+        服务器可能返回单个 JSON，也可能是 NDJSON；每解析出一个带 result
+        字段的对象就立即推回主线程显示。返回是否收到过 result。
+        """
+        decoder = json.JSONDecoder()
+        buf = ""
+        got_result = False
+        payload = json.dumps({"description": text}, ensure_ascii=False).encode("utf-8")
+        with self._http.post(
+            GPT_API_URL,
+            data=payload,
+            stream=True,
+            timeout=(3, 300),
+        ) as resp:
+            resp.raise_for_status()
+            # 未声明 charset 时 iter_content 不会解码，这里默认 UTF-8
+            resp.encoding = resp.encoding or "utf-8"
+            for chunk in resp.iter_content(8192, decode_unicode=True):
+                buf += chunk
+                while True:
+                    buf = buf.lstrip()
+                    if not buf:
+                        break
+                    try:
+                        obj, end = decoder.raw_decode(buf)
+                    except ValueError:
+                        break  # JSON 还不完整，等下一段
+                    buf = buf[end:]
+                    if isinstance(obj, dict) and "result" in obj:
+                        got_result = True
+                        self._post(self._append_chat, str(obj["result"]))
+        return got_result
+
+    def _gpt_done(self, fut: concurrent.futures.Future) -> None:
+        e = fut.exception()
+        if e is not None:
+            answer = self._STR["gpt_error_fmt"].format(err=e)
+            self.log(answer)
+            self._append_chat(answer)
+        elif not fut.result():
+            self._append_chat(self._STR["gpt_no_result"])
+
+    def _append_chat(self, text: str) -> None:
+        """与日志相同：先缓存，再合并成一次 insert 写入输出框。"""
+        self._chat_pending.append(text)
+        if not self._chat_flush_scheduled:
+            self._chat_flush_scheduled = True
+            self.root.after(self.FLUSH_MS, self._flush_chat)
+
+    def _flush_chat(self) -> None:
+        joined = "".join(self._chat_pending)
+        self._chat_pending.clear()
+        self._chat_flush_scheduled = False
+        self.txt_gpt_out.insert("end", joined)
+        self.txt_gpt_out.see("end")
+
+def run_headless(path: str, port: str, syringe: str) -> int:
+    """
+    无界面模式：直接执行协议文件，不创建 Tk 窗口。返回进程退出码。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        steps = _loads(f.read())
+    for i, step in enumerate(steps, start=1):
+        try:
+            validate_step(step.get("type"), step.get("params", {}) or {})
+        except ValueError as e:
+            print(f"[ERROR] step {i}: {e}")
+            return 2
+
+    try:
+        robot = Robot(port)
+    except Exception as e:
+        print(f"[ERROR] Connect failed: {e}")
+        return 1
+    try:
+        robot.set_syringe(syringe)
+        runner = ProtocolRunner(robot, Deck(), steps, syringe)
+        print(f"Connected to {port}, running {len(runner)} steps from {path}")
+        runner.run(on_step=lambda idx, text: print(text))
+        print("Protocol finished.")
+    except KeyboardInterrupt:
+        print("Protocol interrupted.")
+        return 130
+    except Exception as e:
+        print(f"[ERROR] Run protocol failed: {e}")
+        return 1
+    finally:
+        robot.disconnect()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Pipette robot GUI / protocol runner")
+    parser.add_argument("--run", metavar="PROTOCOL.json",
+                        help="run a protocol file without the GUI")
+    parser.add_argument("--port", default="COM4", help="serial port (with --run)")
+    parser.add_argument("--syringe", default="1ml", choices=sorted(SYRINGES),
+                        help="default syringe (with --run)")
+    args = parser.parse_args(argv)
+
+    if args.run:
+        return run_headless(args.run, args.port, args.syringe)
 
-def main() -> None:
     root = tk.Tk()
     app = PipetteGUI(root)
     root.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
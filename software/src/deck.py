@@ -42,7 +42,7 @@ DECK_LAYOUT = {
 # 数据结构
 # ------------------------------------------------------
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DeckSlot:
     """
     Single SBS slot.
@@ -54,6 +54,26 @@ class DeckSlot:
     y_deck: float
 
 
+# ------------------------------------------------------
+# 由 DECK_LAYOUT 预先生成（模块加载时一次）
+# Precomputed from DECK_LAYOUT at import time
+# ------------------------------------------------------
+
+_ORIGIN_X = float(DECK_LAYOUT["origin_machine"]["x"])
+_ORIGIN_Y = float(DECK_LAYOUT["origin_machine"]["y"])
+
+# DeckSlot 为 frozen，所有 Deck 实例可以共享同一份
+_SLOT_INSTANCES: Dict[str, DeckSlot] = {
+    sid: DeckSlot(slot_id=sid, x_deck=float(c["x"]), y_deck=float(c["y"]))
+    for sid, c in DECK_LAYOUT["slots"].items()
+}
+
+_SLOT_CENTERS_MACHINE: Dict[str, Tuple[float, float]] = {
+    sid: (_ORIGIN_X + s.x_deck, _ORIGIN_Y + s.y_deck)
+    for sid, s in _SLOT_INSTANCES.items()
+}
+
+
 class Deck:
     """
     Deck object representing the whole platform.
@@ -64,17 +84,12 @@ class Deck:
     """
 
     def __init__(self) -> None:
-        origin = DECK_LAYOUT["origin_machine"]
-        self.origin_x = float(origin["x"])
-        self.origin_y = float(origin["y"])
-
-        self.slots: Dict[str, DeckSlot] = {}
-        for slot_id, coords in DECK_LAYOUT["slots"].items():
-            self.slots[slot_id] = DeckSlot(
-                slot_id=slot_id,
-                x_deck=float(coords["x"]),
-                y_deck=float(coords["y"]),
-            )
+        self.origin_x = _ORIGIN_X
+        self.origin_y = _ORIGIN_Y
+
+        # 共享模块级的预计算结果（只读，勿修改）
+        self.slots: Dict[str, DeckSlot] = _SLOT_INSTANCES
+        self._slot_center_cache: Dict[str, Tuple[float, float]] = _SLOT_CENTERS_MACHINE
 
     # --------------------------------------------------
     # 坐标变换 / Coordinate transform
@@ -97,5 +112,4 @@ class Deck:
 
         返回某个 Slot 的中心（machine 坐标系）。
         """
-        slot = self.slots[slot_id]
-        return self.deck_to_machine(slot.x_deck, slot.y_deck)
+        return self._slot_center_cache[slot_id]
@@ -13,8 +13,9 @@ robot.py 不应含有任何硬编码数字，所有硬件参数均来自本文
 """
 
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Tuple, Dict
+import functools
+from dataclasses import dataclass, field
+from typing import Tuple, Dict, Iterable, List
 
 from src.deck import Deck, DeckSlot
 
@@ -23,7 +24,7 @@ from src.deck import Deck, DeckSlot
 # 1. 注射器类型 (U-axis ↔ volume)
 # ======================================================
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SyringeType:
     """
     Syringe calibration model.
@@ -42,6 +43,20 @@ class SyringeType:
     u_min: float | None = None
     u_max: float | None = None
 
+    @functools.lru_cache(maxsize=256)
+    def ul_to_u(self, volume_ul: float) -> float:
+        """
+        U position after aspirating volume_ul from u_base.
+        从 u_base 吸入 volume_ul 后 U 轴的位置，并检查行程限制。
+        同一体积反复使用时直接命中缓存（SyringeType 为 frozen，可哈希）。
+        """
+        if self.u_min is not None and self.u_base < self.u_min:
+            raise ValueError("u_base below syringe u_min.")
+        u = self.u_base + volume_ul * self.u_per_ul
+        if self.u_max is not None and u > self.u_max:
+            raise ValueError("U travel exceeds syringe u_max, check volume.")
+        return u
+
 
 # Example syringe: 1ml (placeholder values)
 # 示例 1ml 注射器（占位数值，之后可根据实验重新标定）
@@ -63,7 +78,7 @@ SYRINGES: Dict[str, SyringeType] = {
 # 2. 器皿类型 LabwareType
 # ======================================================
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LabwareType:
     """
     Describe an SBS labware type (96 tips, 48 wells, beaker holder, tip waste box…).
@@ -111,7 +126,7 @@ class LabwareType:
 # 3. LabwareInstance (把几何映射到 slot / deck / machine)
 # ======================================================
 
-@dataclass
+@dataclass(slots=True)
 class LabwareInstance:
     """
     Physical instance of a LabwareType on a deck slot.
@@ -124,9 +139,48 @@ class LabwareInstance:
     label: str
     deck: Deck
 
+    # 以下字段由 __post_init__ 填充
+    _xs: List[float] = field(init=False, repr=False)
+    _ys: List[float] = field(init=False, repr=False)
+    _well_rc_cache: Dict[str, Tuple[int, int]] = field(init=False, repr=False)
+    _machine_xy: Dict[str, Tuple[float, float]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """
+        Precompute machine XY of every well.
+        几何参数创建后不再改变，一次算好所有孔位的 machine 坐标，之后查表即可。
+        """
+        t = self.type
+        x0, y0 = self.deck.deck_to_machine(
+            self.slot.x_deck + t.offset_x, self.slot.y_deck + t.offset_y
+        )
+        # 每一列的 X、每一行的 Y（machine 坐标）
+        self._xs = [x0 + c * t.pitch_x for c in range(t.cols)]
+        self._ys = [y0 + r * t.pitch_y for r in range(t.rows)]
+
+        # 孔名 → (row, col) 以及 孔名 → machine (x, y)
+        self._well_rc_cache = {}
+        self._machine_xy = {}
+        for r, y in enumerate(self._ys):
+            row_char = chr(ord("A") + r)
+            for c, x in enumerate(self._xs):
+                name = f"{row_char}{c + 1}"
+                self._well_rc_cache[name] = (r, c)
+                self._machine_xy[name] = (x, y)
+
     def _well_rc(self, well: str) -> Tuple[int, int]:
         """Convert well name 'A1' → (row_idx, col_idx)"""
+        try:
+            return self._well_rc_cache[well]
+        except KeyError:
+            pass
         well = well.strip().upper()
+        if well in self._well_rc_cache:
+            return self._well_rc_cache[well]
+
+        # 不在表里：解析一遍，给出越界 / 格式错误的具体报错（"A01" 等写法也走这里）
+        if len(well) < 2:
+            raise ValueError(f"Invalid well name: '{well}'")
         row_char = well[0]
         col = int(well[1:]) - 1
         row = ord(row_char) - ord("A")
@@ -138,6 +192,14 @@ class LabwareInstance:
 
         return row, col
 
+    def normalize_well(self, well: str) -> str:
+        """
+        Return the canonical well name, e.g. ' a01' → 'A1'.
+        返回规范化的孔名（大写 "A1" 形式）；格式错误或越界时抛 ValueError。
+        """
+        r, c = self._well_rc(well)
+        return f"{chr(ord('A') + r)}{c + 1}"
+
     def well_position_deck(self, well: str) -> Tuple[float, float]:
         """Return well coordinate in DECK space."""
         r, c = self._well_rc(well)
@@ -147,9 +209,22 @@ class LabwareInstance:
 
     def well_position_machine(self, well: str) -> Tuple[float, float]:
         """Return well coordinate in MACHINE space."""
+        try:
+            return self._machine_xy[well]
+        except KeyError:
+            pass
+        # 非标准写法（如 " a1"、"A01"）或越界：走 _well_rc，保留清晰的报错
         x_d, y_d = self.well_position_deck(well)
         return self.deck.deck_to_machine(x_d, y_d)
 
+    def well_positions_machine(self, wells: Iterable[str]) -> List[Tuple[float, float]]:
+        """
+        Return MACHINE coordinates for several wells at once.
+        批量查询多个孔位的 machine 坐标，便于提前规划一串 XY 移动。
+        """
+        table = self._machine_xy
+        return [table[w] if w in table else self.well_position_machine(w) for w in wells]
+
 
 # ======================================================
 # 4. 具体器皿类型定义
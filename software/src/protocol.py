@@ -0,0 +1,335 @@
+# protocol.py
+"""
+PROTOCOL (协议执行)
+Step validation and execution for JSON protocols, independent of the GUI.
+
+协议步骤的校验与执行，不依赖 Tk：
+1. validate_step：按步骤类型校验 params（JSON Schema）
+2. ProtocolRunner：把步骤列表编译成可直接调用的函数并依次执行
+
+gui.py 的「执行协议」按钮和命令行无界面模式（gui.py --run）共用这里的逻辑。
+"""
+
+from __future__ import annotations
+
+import threading
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.deck import Deck
+from src.labware import (
+    SYRINGES,
+    LABWARE_TIPRACK_96,
+    LABWARE_48WELL_10MM,
+)
+from src.robot import Robot
+
+
+# ======================================================
+# 1. 参数校验
+# ======================================================
+
+# 各步骤类型的参数格式（JSON Schema）。添加 / 载入步骤时先校验，
+# 运行协议时就不会因为缺字段而在中途失败。
+_T_NUM = {"type": "number"}
+_T_STR = {"type": "string"}
+_STEP_SCHEMAS: Dict[str, dict] = {
+    "home_xyz": {"type": "object"},
+    "pick_tip": {
+        "type": "object",
+        "required": ["slot", "well"],
+        "properties": {"slot": _T_STR, "well": _T_STR},
+    },
+    "drop_tip": {
+        "type": "object",
+        "required": ["slot"],
+        "properties": {"slot": _T_STR, "edge": _T_STR},
+    },
+    "transfer": {
+        "type": "object",
+        "required": ["src_slot", "src_well", "dst_slot", "dst_well", "volume_ul"],
+        "properties": {
+            "src_slot": _T_STR, "src_well": _T_STR,
+            "dst_slot": _T_STR, "dst_well": _T_STR,
+            "volume_ul": _T_NUM, "syringe": _T_STR,
+        },
+    },
+    "aspirate": {
+        "type": "object",
+        "required": ["volume_ul"],
+        "properties": {"slot": _T_STR, "well": _T_STR, "volume_ul": _T_NUM, "syringe": _T_STR},
+    },
+    "dispense": {
+        "type": "object",
+        "required": ["volume_ul"],
+        "properties": {"slot": _T_STR, "well": _T_STR, "volume_ul": _T_NUM, "syringe": _T_STR},
+    },
+    "dwell": {
+        "type": "object",
+        "properties": {"seconds": _T_NUM},
+    },
+}
+
+# 支持的步骤类型（GUI 下拉框的选项）
+STEP_TYPES: Tuple[str, ...] = tuple(_STEP_SCHEMAS)
+
+# 有 fastjsonschema 时把 schema 编译成校验函数；否则用下面的简单实现
+try:
+    import fastjsonschema
+
+    _VALIDATORS = {t: fastjsonschema.compile(sc) for t, sc in _STEP_SCHEMAS.items()}
+
+except ImportError:
+    _PY_TYPES = {"number": (int, float), "string": (str,), "null": (type(None),)}
+
+    def _make_validator(schema: dict):
+        required = schema.get("required", ())
+        props = {}
+        for k, v in schema.get("properties", {}).items():
+            # "type" 可以是单个类型名或列表；与 fastjsonschema 一致，只有写了 "null" 才接受 None
+            names = v["type"] if isinstance(v["type"], list) else [v["type"]]
+            props[k] = (tuple(t for n in names for t in _PY_TYPES[n]), " or ".join(names))
+
+        def validate(params):
+            if not isinstance(params, dict):
+                raise ValueError("params must be an object")
+            for key in required:
+                if key not in params:
+                    raise ValueError(f"params must contain '{key}'")
+            for key, (typ, name) in props.items():
+                if key not in params:
+                    continue
+                val = params[key]
+                if not isinstance(val, typ) or isinstance(val, bool):
+                    raise ValueError(f"params.{key} must be {name}")
+            return params
+
+        return validate
+
+    _VALIDATORS = {t: _make_validator(sc) for t, sc in _STEP_SCHEMAS.items()}
+
+
+def validate_step(step_type: str, params) -> None:
+    """校验步骤参数，不合法时抛出 ValueError。"""
+    validator = _VALIDATORS.get(step_type)
+    if validator is None:
+        raise ValueError(f"Unknown step type: {step_type}")
+    validator(params)
+
+
+# 各步骤引用的 (slot 字段, well 字段, 器皿类型)，编译协议时据此检查孔位
+_STEP_WELLS = {
+    "pick_tip": (("slot", "well", LABWARE_TIPRACK_96),),
+    "drop_tip": (("slot", None, None),),
+    "transfer": (
+        ("src_slot", "src_well", LABWARE_48WELL_10MM),
+        ("dst_slot", "dst_well", LABWARE_48WELL_10MM),
+    ),
+    "aspirate": (("slot", "well", LABWARE_48WELL_10MM),),
+    "dispense": (("slot", "well", LABWARE_48WELL_10MM),),
+}
+
+
+# ======================================================
+# 2. 执行
+# ======================================================
+
+class ProtocolRunner:
+    """
+    Compile and run a list of protocol steps on a robot.
+
+    协议执行器：构造时把步骤编译成 (日志文本, 无参函数) 列表，
+    槽位 / 孔位 / 注射器等问题在机器人移动之前就会抛出 ValueError。
+    run() 在调用线程中依次执行，cancel 被置位时在步骤之间停止。
+    """
+
+    def __init__(
+        self,
+        robot: Robot,
+        deck: Deck,
+        steps: List[dict],
+        default_syringe: str,
+        cancel: Optional[threading.Event] = None,
+    ) -> None:
+        self.robot = robot
+        self.deck = deck
+        self.default_syringe = default_syringe
+        self.cancel = cancel if cancel is not None else threading.Event()
+
+        # 步骤类型 → 处理函数
+        self._handlers: Dict[str, Callable[[dict], None]] = {
+            "home_xyz": self._step_home_xyz,
+            "pick_tip": self._step_pick,
+            "drop_tip": self._step_drop,
+            "transfer": self._step_transfer,
+            "aspirate": self._step_aspirate,
+            "dispense": self._step_dispense,
+            "dwell": self._step_dwell,
+        }
+        self.compiled: List[Tuple[str, Callable[[], None]]] = self._compile(steps)
+
+    def __len__(self) -> int:
+        return len(self.compiled)
+
+    def run(
+        self,
+        on_step: Optional[Callable[[int, str], None]] = None,
+        on_step_done: Optional[Callable[[int], None]] = None,
+    ) -> bool:
+        """
+        依次执行所有步骤。on_step(idx, text) 在每步开始前调用，
+        on_step_done(idx) 在每步完成后调用（idx 从 1 开始）。
+
+        返回 True 表示全部执行完，False 表示被取消。
+        """
+        for idx, (text, fn) in enumerate(self.compiled, start=1):
+            if self.cancel.is_set():
+                return False
+            if on_step is not None:
+                on_step(idx, text)
+            fn()
+            if on_step_done is not None:
+                on_step_done(idx)
+        return True
+
+    # --------------------------------------------------
+    # 编译 / Compile
+    # --------------------------------------------------
+
+    def _compile(self, steps: List[dict]) -> List[Tuple[str, Callable[[], None]]]:
+        """按 step type 查找处理函数，并绑定检查过的参数。"""
+        compiled = []
+        for idx, step in enumerate(steps, start=1):
+            step_type = step.get("type")
+            params = step.get("params", {}) or {}
+            handler = self._handlers.get(step_type)
+            if handler is None:
+                raise ValueError(f"Unknown step type: {step_type}")
+            try:
+                parsed = self._parse_step(step_type, params)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Step {idx} ({step_type}): {e}") from None
+            compiled.append((f"Step {idx}: {step_type} {params}", partial(handler, parsed)))
+        return compiled
+
+    def _parse_step(self, step_type: str, params: dict) -> dict:
+        """
+        运行前检查一个步骤：槽位存在、孔位在器皿范围内、注射器已定义、
+        移液体积不超出注射器行程、edge 合法。
+        返回规范化后的参数副本（孔名统一为大写 "A1" 形式，可直接命中坐标缓存）。
+        """
+        deck = self.deck
+        parsed = dict(params)
+        for slot_key, well_key, lw_type in _STEP_WELLS.get(step_type, ()):
+            slot_id = parsed.get(slot_key)
+            # 缺少或为 null 的槽位都在编译时报错，不留到运行中途
+            if slot_id is None:
+                raise ValueError(f"{slot_key} is required")
+            if slot_id not in deck.slots:
+                raise ValueError(f"unknown slot '{slot_id}'")
+            well = parsed.get(well_key) if well_key else None
+            if well is not None:
+                # 与执行时共用 Robot 的器皿实例缓存
+                plate = self.robot.get_labware(deck, lw_type, slot_id)
+                parsed[well_key] = plate.normalize_well(well)
+
+        syringe = parsed.get("syringe", self.default_syringe)
+        if step_type in ("transfer", "aspirate", "dispense") and syringe not in SYRINGES:
+            raise ValueError(f"unknown syringe '{syringe}'")
+        if step_type == "transfer":
+            # 体积超出注射器 u_max 时在这里就报错，而不是执行到一半才失败
+            SYRINGES[syringe].ul_to_u(parsed["volume_ul"])
+        if step_type == "drop_tip" and parsed.get("edge", "left") not in ("left", "right"):
+            raise ValueError("edge must be 'left' or 'right'")
+        if "seconds" in parsed:
+            parsed["seconds"] = float(parsed["seconds"])
+        return parsed
+
+    # --------------------------------------------------
+    # 各类步骤 / Step handlers
+    # --------------------------------------------------
+
+    def _step_home_xyz(self, params: dict) -> None:
+        self.robot.home("XYZ", timeout=9999.0)
+
+    def _step_pick(self, params: dict) -> None:
+        self.robot.pick_up_tip(self.deck, slot_id=params["slot"], well=params["well"])
+
+    def _step_drop(self, params: dict) -> None:
+        edge = params.get("edge", "left")
+        self.robot.drop_tip_scrape(self.deck, slot_id=params["slot"], edge=edge)
+
+    def _step_transfer(self, params: dict) -> None:
+        p = params
+        self.robot.transfer_volume(
+            self.deck,
+            src_slot=p["src_slot"],
+            src_well=p["src_well"],
+            dst_slot=p["dst_slot"],
+            dst_well=p["dst_well"],
+            volume_ul=p["volume_ul"],
+            syringe=p.get("syringe", self.default_syringe),
+        )
+
+    def _step_aspirate(self, params: dict) -> None:
+        p = params
+        syringe_name = p.get("syringe", self.default_syringe)
+        volume_ul = p["volume_ul"]
+
+        slot = p.get("slot")
+        well = p.get("well")
+
+        if slot is None:
+            raise ValueError("aspirate 步骤需要提供 slot。")
+
+        if well is not None:
+            # 情况 1：slot + well → 使用 48wells
+            self.robot.aspirate(
+                volume_ul=volume_ul,
+                syringe=syringe_name,
+                deck=self.deck,
+                slot_id=slot,
+                well=well,
+                # labware_type=默认 48 wells
+            )
+        else:
+            # 情况 2：slot + 无 well → 视为 beaker
+            self.robot.aspirate_from_beaker(
+                deck=self.deck,
+                slot_id=slot,
+                volume_ul=volume_ul,
+                syringe=syringe_name,
+            )
+
+    def _step_dispense(self, params: dict) -> None:
+        p = params
+        syringe_name = p.get("syringe", self.default_syringe)
+        volume_ul = p["volume_ul"]
+
+        slot = p.get("slot")
+        well = p.get("well")
+
+        if slot is None:
+            raise ValueError("dispense 步骤需要提供 slot。")
+
+        if well is not None:
+            # 情况 1：slot + well → 使用 48wells
+            self.robot.dispense(
+                volume_ul=volume_ul,
+                syringe=syringe_name,
+                deck=self.deck,
+                slot_id=slot,
+                well=well,
+                # labware_type=默认 48 wells
+            )
+        else:
+            # 情况 2：slot + 无 well → 视为 beaker
+            self.robot.dispense_to_beaker(
+                deck=self.deck,
+                slot_id=slot,
+                volume_ul=volume_ul,
+                syringe=syringe_name,
+            )
+
+    def _step_dwell(self, params: dict) -> None:
+        self.robot.dwell(params.get("seconds", 1.0), cancel=self.cancel)
@@ -13,8 +13,14 @@ Robot control for the pipette platform.
 
 from __future__ import annotations
 
+import functools
+import os
+import queue
+import re
+import sys
+import threading
 import time
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import serial
 
@@ -30,6 +36,20 @@ from src.labware import (
     SyringeType,
 )
 
+# M114 回复中的坐标项，例如 "X:10.00"
+_M114_RE = re.compile(r"\b([XYZU]):(-?\d+(?:\.\d+)?)")
+
+
+@functools.lru_cache(maxsize=256)
+def _u_token(u: float) -> bytes:
+    """
+    G-code token for a U target, e.g. b" U8.000".
+
+    U 轴目标值的 G-code 片段。U 只会取 u_base 和各体积对应的吸液位置，
+    批量移液时反复出现同几个值，格式化结果直接缓存。
+    """
+    return b" U%.3f" % u
+
 
 class Robot:
     """
@@ -67,6 +87,23 @@ class Robot:
     # 初始化与串口管理 / Initialization & Serial I/O
     # --------------------------------------------------
 
+    # 最多允许多少行 G-code 已发出但还没收到 'ok'。
+    # 固件命令队列 BUFSIZE = 4（Configuration_adv.h），且未开启 ADVANCED_OK，
+    # 无法从 'ok' 中读出剩余空位，所以窗口直接取队列长度。
+    MAX_INFLIGHT = 4
+
+    # 等待「无主」'ok'（超时放弃的查询迟到的回复）最多多少秒，超过就当作丢失
+    ORPHAN_GRACE = 2.0
+
+    # move_to 中坐标变化小于该值（mm）视为没变，不再重复发送该轴
+    POS_EPS = 1e-4
+
+    # 常用的回零组合预先拼好，home() 直接查表（其它写法走通用解析）
+    _HOME_CMDS = {
+        axes: "G28 " + " ".join(axes)
+        for axes in ("X", "Y", "Z", "U", "XY", "YZ", "XYZ", "XYZU")
+    }
+
     def __init__(
         self,
         port: str,
@@ -90,12 +127,31 @@ class Robot:
         self.timeout = timeout
 
         self._ser: Optional[serial.Serial] = None
+        # 后台线程持续读串口，收到的每一行（bytes）放进队列；None 表示串口已关闭
+        self._rx_queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._rx_thread: Optional[threading.Thread] = None
+        # 已发送、尚未收到 'ok' 的行数 / lines sent but not yet acknowledged
+        self._inflight = 0
+        # 已放弃等待、但 'ok' 可能还会迟到的行数；下次写入前限时收掉
+        self._orphans = 0
+        # 最近一次发给固件的绝对坐标与进给速度（None = 未知）。
+        # G1 的 F 是模态的，绝对模式下坐标也一样：没变的轴不必重复发送。
+        self._last: Dict[str, Optional[float]] = dict.fromkeys("XYZUF")
+        # 是否确定处于 G90 绝对模式；只有绝对模式下才能省略没变的坐标
+        self._absolute = False
 
         # 可选：当前平台与注射器信息（高层动作使用）
         # Optional: current deck and syringe settings
         self.deck: Optional[Deck] = None
         self.current_syringe: Optional[SyringeType] = None
 
+        # (器皿类型, slot) → LabwareInstance；孔位坐标在实例里已经算好，
+        # 重复的移液动作直接查表。换了 Deck 对象时整表作废。
+        self._labware_cache: Dict[Tuple[LabwareType, str], LabwareInstance] = {}
+        self._labware_deck: Optional[Deck] = None
+        # 高层动作的 G-code 模板（只依赖器皿类型等固定参数）
+        self._template_cache: Dict[tuple, Tuple[List[str], str, List[str]]] = {}
+
         if auto_connect:
             self.connect()
 
@@ -115,8 +171,39 @@ class Robot:
             self.baudrate,
             timeout=self.timeout,
         )
+        self._set_low_latency()
         # 清空缓冲区，避免旧数据干扰
         self._flush_input()
+        self._inflight = 0
+        self._orphans = 0
+        self._forget_position()
+        self._absolute = False
+
+        self._rx_thread = threading.Thread(
+            target=self._rx_pump, args=(self._ser,), name="robot-rx", daemon=True
+        )
+        self._rx_thread.start()
+
+    def _set_low_latency(self) -> None:
+        """
+        Ask the Linux USB-serial driver to deliver bytes immediately.
+
+        Linux 下 USB 转串口默认会攒数据再上报（FTDI 的 latency_timer 为 16 ms），
+        每等一个 'ok' 都可能多出十几毫秒。这里尽量打开 ASYNC_LOW_LATENCY，
+        FTDI 再把 latency_timer 设为 1 ms。驱动不支持或没有权限时静默跳过。
+        """
+        if not sys.platform.startswith("linux"):
+            return
+        try:
+            self._ser.set_low_latency_mode(True)
+        except (AttributeError, OSError, ValueError):
+            pass
+        tty = os.path.basename(os.path.realpath(self.port))
+        try:
+            with open(f"/sys/bus/usb-serial/devices/{tty}/latency_timer", "w") as f:
+                f.write("1")
+        except OSError:
+            pass
 
     def disconnect(self) -> None:
         """
@@ -125,11 +212,26 @@ class Robot:
         关闭串口连接。
         """
         if self._ser is not None:
+            try:
+                # 写入时不再逐行 flush()，关闭前把内核里剩余的输出发完
+                self._ser.flush()
+            except Exception:
+                pass
+            try:
+                # 先打断后台线程里阻塞的 readline，再关闭串口
+                self._ser.cancel_read()
+            except Exception:
+                pass
             try:
                 self._ser.close()
             except Exception:
                 pass
             self._ser = None
+        if self._rx_thread is not None:
+            self._rx_thread.join(timeout=self.timeout + 1.0)
+            self._rx_thread = None
+        self._inflight = 0
+        self._orphans = 0
 
     def _ensure_connected(self) -> None:
         """
@@ -144,65 +246,152 @@ class Robot:
         """
         Flush any pending bytes from the input buffer.
 
-        清空串口输入缓冲区，丢弃所有未读数据。
+        清空串口输入缓冲区和后台线程的行队列，丢弃所有未读数据。
         """
         if self._ser is None:
             return
         self._ser.reset_input_buffer()
+        while True:
+            try:
+                self._rx_queue.get_nowait()
+            except queue.Empty:
+                break
 
     def _write_line(self, line: str) -> None:
         """
         Write a line of G-code to the firmware.
 
         发送一行 G-code 到固件（自动添加换行）。
+        write() 把数据交给内核就返回，不再 flush() 等待发送完毕：
+        之后反正要等固件的 'ok'，串口数据也不会因此丢失。
         """
         self._ensure_connected()
         data = (line.strip() + "\n").encode("ascii")
         self._ser.write(data)
-        self._ser.flush()
 
-    def _read_line(self) -> str:
+    def _write_lines(self, lines: List[str]) -> None:
         """
-        Read a line from firmware (blocking up to timeout).
+        Write several lines of G-code with a single write().
 
-        从固件读取一行文本（阻塞直到 timeout）。
+        把多行 G-code 拼成一块，一次写入串口。
         """
         self._ensure_connected()
-        raw = self._ser.readline()
-        if not raw:
-            return ""
+        data = "".join(line.strip() + "\n" for line in lines).encode("ascii")
+        self._ser.write(data)
+
+    def _rx_pump(self, ser: serial.Serial) -> None:
+        """
+        Background reader: push every firmware line into _rx_queue.
+
+        后台线程：持续读取串口，把每一行（去掉首尾空白的 bytes）放进 _rx_queue。
+        不在这里解码：绝大多数行只是 'ok'，直接按 bytes 比较即可。
+        串口关闭或出错时放入 None 并退出。
+        """
+        while ser.is_open:
+            try:
+                raw = ser.readline()
+            except Exception:
+                break
+            if raw:
+                self._rx_queue.put(raw.strip())
+        self._rx_queue.put(None)
+
+    def _read_line_bytes(self, timeout: Optional[float] = None) -> bytes:
+        """
+        Read a raw line from firmware (blocking up to timeout).
+
+        从后台线程的队列取一行固件输出（bytes），最多等待 timeout 秒
+        （默认为串口 timeout，负数按 0 处理）。没有数据时返回 b""。
+        """
+        if timeout is None:
+            timeout = self.timeout
         try:
-            return raw.decode("ascii", errors="ignore").strip()
-        except Exception:
-            return ""
+            raw = self._rx_queue.get(timeout=max(0.0, timeout))
+        except queue.Empty:
+            return b""
+        if raw is None:
+            raise RuntimeError("Serial connection closed. 串口已关闭。")
+        return raw
+
+    def _read_line(self, timeout: Optional[float] = None) -> str:
+        """
+        Read a line from firmware as text.
+
+        同 _read_line_bytes，但解码为文本，供需要解析内容的地方使用（如 M114）。
+        """
+        return self._read_line_bytes(timeout).decode("ascii", errors="ignore")
 
     def _drain_until_ok_or_timeout(self, overall_timeout: float) -> None:
         """
         Read lines until an 'ok' is received or timeout occurs.
 
         持续读取固件输出，直到收到 'ok' 或者超时。
-        - 收到 'ok' → 正常返回
-        - 收到 Error / error → 仍然抛 RuntimeError
-        - 超时 → 只打印警告，不抛异常（避免 GUI 弹框）
+        - 收到 'ok' → 正常返回，在途行数减一
+        - 收到 Error / error → 限时收掉其余在途行的 'ok' 后抛 RuntimeError
+        - 超时 → 只打印警告，不抛异常（避免 GUI 弹框）；其余在途行同样限时收掉
+        两种情况都不直接清零计数：还在路上的 'ok' 会被误当成之后命令的确认，
+        让后面的 M400 / wait_idle 在运动结束前就返回。
         """
-        start = time.time()
+        self._ensure_connected()
+        # overall_timeout 为 None 或 <=0 时视为「无限等待」
+        # 截止时间用单调时钟的整数纳秒，不受系统时间调整影响
+        deadline = None
+        if overall_timeout is not None and overall_timeout > 0:
+            deadline = time.monotonic_ns() + int(overall_timeout * 1e9)
         while True:
-            line = self._read_line()
-            if line:
+            if deadline is not None:
+                raw = self._read_line_bytes((deadline - time.monotonic_ns()) / 1e9)
+            else:
+                raw = self._read_line_bytes()
+            if raw:
                 # 简单调试输出：可根据需要保留或注释
-                # print(f"[FW] {line}")
-                if line.startswith("Error") or "error" in line.lower():
-                    raise RuntimeError(f"Firmware error: {line}")
-                if line.strip().lower() == "ok":
+                # print(f"[FW] {raw!r}")
+                # 直接比较 bytes，只有报错时才解码成文本
+                if raw == b"ok" or raw.lower() == b"ok":
+                    self._inflight = max(0, self._inflight - 1)
                     return
-            # overall_timeout 为 None 或 <=0 时视为「无限等待」
-            if overall_timeout is not None and overall_timeout > 0:
-                if time.time() - start > overall_timeout:
+                if raw.startswith(b"Error") or b"error" in raw.lower():
+                    self._abandon_inflight()
+                    line = raw.decode("ascii", errors="ignore")
+                    raise RuntimeError(f"Firmware error: {line}")
+            if deadline is not None:
+                if time.monotonic_ns() > deadline:
                     # 超时：只给出一个终端 warning，然后返回，不抛 TimeoutError
                     print("[WARN] Timeout waiting for 'ok' from firmware, "
                           "ignore and continue.")
+                    self._abandon_inflight()
                     return
 
+    def _abandon_inflight(self) -> None:
+        """
+        Stop waiting for the in-flight lines and resynchronise with the firmware.
+
+        出错或超时后把所有在途行改记为无主行，并立即限时收掉它们的 'ok'
+        （出错的那一行可能没有 'ok'，等满 ORPHAN_GRACE 后清空缓冲区）。
+        坐标记录不再可信，一并清空。
+        """
+        self._orphans += self._inflight
+        self._inflight = 0
+        self._forget_position()
+        self._settle_orphans()
+
+    def _settle_orphans(self) -> None:
+        """
+        Absorb late 'ok's for lines we stopped waiting for.
+
+        在写下一行之前，限时（共 ORPHAN_GRACE 秒）收掉已放弃的行迟到的 'ok'，
+        免得被当成新命令的确认；等不到就当作丢失，清空输入缓冲区后继续。
+        调用时不能有正常在途的行，否则分不清 'ok' 属于谁。
+        """
+        deadline = time.monotonic_ns() + int(self.ORPHAN_GRACE * 1e9)
+        while self._orphans > 0:
+            raw = self._read_line_bytes((deadline - time.monotonic_ns()) / 1e9)
+            if raw.lower() == b"ok":
+                self._orphans -= 1
+            elif not raw and time.monotonic_ns() >= deadline:
+                self._flush_input()
+                self._orphans = 0
+
     # --------------------------------------------------
     # G-code 封装 / G-code wrapper
     # --------------------------------------------------
@@ -218,24 +407,135 @@ class Robot:
 
         发送一条原始 G-code 指令到固件。
 
+        wait_ok=False 时不等 'ok' 直接返回，让多行命令同时在固件队列里排队
+        （滑动窗口：在途行数达到 MAX_INFLIGHT 时先等最早的一个 'ok'）。
+        Marlin 按顺序回复 'ok'，所以之后任意一次 wait_ok=True 或 wait_idle()
+        都会把前面所有行的 'ok' 一并收完。
+
         Args:
             gcode:            要发送的 G-code 字符串（不含换行）
-            wait_ok:          是否等待固件返回 'ok'
-            overall_timeout:  等待 'ok' 的最长时间（秒）
+            wait_ok:          是否等待固件返回 'ok'（以及之前所有在途行的 'ok'）
+            overall_timeout:  等待每个 'ok' 的最长时间（秒）
+        """
+        self._track_raw(gcode)
+        data = (gcode.strip() + "\n").encode("ascii")
+        self._send_bytes(data, wait_ok, overall_timeout)
+
+    def _forget_position(self) -> None:
+        """清空记录的坐标 / 速度，下一次 move_to 会完整发送所有轴。"""
+        self._last = dict.fromkeys("XYZUF")
+
+    def _track_raw(self, gcode: str) -> None:
+        """
+        Update mode / position bookkeeping for a raw G-code line.
+
+        原样发送的 G-code 可能改变坐标模式、位置或速度，这里无法逐一解析：
+        记下 G90 / G91，凡是带轴字母、F 或回零 / 设坐标的行都清空记录。
+        """
+        upper = gcode.strip().upper()
+        if upper.startswith("G90"):
+            self._absolute = True
+        elif upper.startswith("G91"):
+            self._absolute = False
+        if upper.startswith(("G28", "G91", "G92")) or any(c in upper for c in "XYZUF"):
+            self._forget_position()
+
+    def _send_bytes(self, data: bytes, wait_ok: bool, overall_timeout: float) -> None:
+        """
+        Send one already-encoded line (ending in newline) through the window.
+
+        发送一行已编码好的 G-code（以换行结尾），在途行数的处理同 send_gcode。
+        """
+        if self._orphans:
+            self._settle_orphans()
+        while self._inflight >= self.MAX_INFLIGHT:
+            self._drain_until_ok_or_timeout(overall_timeout)
+        self._ensure_connected()
+        self._ser.write(data)
+        self._inflight += 1
+        if wait_ok:
+            self.wait_idle(overall_timeout)
+
+    def send_gcode_nowait(self, gcode: str) -> None:
+        """
+        Queue a G-code line without waiting for its 'ok'.
+
+        只排队发送，不等 'ok'（等价于 send_gcode(gcode, wait_ok=False)）。
+        """
+        self.send_gcode(gcode, wait_ok=False)
+
+    def send_lines(
+        self,
+        lines: List[str],
+        wait_ok: bool = False,
+        overall_timeout: float = 999.0,
+    ) -> None:
         """
-        self._write_line(gcode)
+        Send a pre-rendered block of G-code lines.
+
+        发送一段事先拼好的多行 G-code：窗口有几个空位就一次写出几行，
+        而不是每行一次 write()。每次写出的行数不超过 MAX_INFLIGHT，
+        固件的串口接收缓冲区不会被整段命令塞满。
+        """
+        for line in lines:
+            self._track_raw(line)
+        if self._orphans:
+            self._settle_orphans()
+        i = 0
+        while i < len(lines):
+            while self._inflight >= self.MAX_INFLIGHT:
+                self._drain_until_ok_or_timeout(overall_timeout)
+            chunk = lines[i:i + self.MAX_INFLIGHT - self._inflight]
+            self._write_lines(chunk)
+            self._inflight += len(chunk)
+            i += len(chunk)
         if wait_ok:
+            self.wait_idle(overall_timeout)
+
+    def wait_idle(self, overall_timeout: float = 9999.0) -> None:
+        """
+        Wait until every line sent so far has been acknowledged.
+
+        等待所有已发送行的 'ok' 都收到（固件已接收这些命令，运动不一定结束）。
+        """
+        while self._inflight > 0:
             self._drain_until_ok_or_timeout(overall_timeout)
 
-    def dwell(self, seconds: float) -> None:
+    def wait_moves(self, overall_timeout: float = 9999.0) -> None:
+        """
+        Block until every queued move has physically finished (M400).
+
+        Marlin 在「解析完」一行时就回 'ok'，运动可能还没开始；
+        M400 的 'ok' 要等规划器里所有运动都执行完才回。
+        高层动作最后调用一次，返回时机器人确实已经停在终点。
+        """
+        self.send_gcode("M400", wait_ok=True, overall_timeout=overall_timeout)
+
+    def dwell(
+        self,
+        seconds: float,
+        cancel: threading.Event | None = None,
+        wait_ok: bool = False,
+    ) -> None:
         """
         Firmware-side dwell using G4.
 
         使用 G4 命令让固件等待指定时间（秒），
         比 Python 的 time.sleep 更安全，因为电机运动由固件控制。
+
+        G4 和前后的 G1 一样排进固件队列，默认不等 'ok' 直接返回：
+        固件按顺序执行，后面的运动自然会等 G4 结束。
+        需要在主机端确认等待结束时传 wait_ok=True。
+
+        若传入 cancel：先用 M400 等待所有运动完成，再在主机端等待，
+        cancel 被置位时立即返回（固件中的 G4 无法中途打断）。
         """
-        ms = int(seconds * 1000)
-        self.send_gcode(f"G4 P{ms}", wait_ok=True, overall_timeout=seconds + 5.0)
+        if cancel is None:
+            ms = int(seconds * 1000)
+            self.send_gcode(f"G4 P{ms}", wait_ok=wait_ok, overall_timeout=seconds + 5.0)
+            return
+        self.wait_moves()
+        cancel.wait(seconds)
 
     # --------------------------------------------------
     # Homing / Coordinate Modes
@@ -265,29 +565,30 @@ class Robot:
             home("YZ")   → G28 Y Z
             home("U")    → G28 U
         """
-        axes = axes.upper()
-        parts = ["G28"]
-        for a in axes:
-            if a in ("X", "Y", "Z", "U"):
-                parts.append(a)
-        cmd = " ".join(parts)
+        cmd = self._HOME_CMDS.get(axes)
+        if cmd is None:
+            parts = ["G28"]
+            for a in axes.upper():
+                if a in ("X", "Y", "Z", "U"):
+                    parts.append(a)
+            cmd = " ".join(parts)
         self.send_gcode(cmd, wait_ok=True, overall_timeout=timeout)
 
-    def set_absolute_mode(self) -> None:
+    def set_absolute_mode(self, wait_ok: bool = True) -> None:
         """
         Set absolute positioning mode (G90).
 
         设置绝对坐标模式（G90）。
         """
-        self.send_gcode("G90")
+        self.send_gcode("G90", wait_ok=wait_ok)
 
-    def set_relative_mode(self) -> None:
+    def set_relative_mode(self, wait_ok: bool = True) -> None:
         """
         Set relative positioning mode (G91).
 
         设置相对坐标模式（G91）。
         """
-        self.send_gcode("G91")
+        self.send_gcode("G91", wait_ok=wait_ok)
 
     # --------------------------------------------------
     # 轴运动 / Axis movement
@@ -301,6 +602,7 @@ class Robot:
         u: Optional[float] = None,
         feedrate: Optional[float] = None,
         overall_timeout: float = 999.0,
+        wait_ok: bool = True,
     ) -> None:
         """
         Move axes to target position using G1 (in current coord mode).
@@ -309,23 +611,42 @@ class Robot:
 
         Args:
             x, y, z, u: 目标坐标（如果为 None 则忽略该轴）
-            feedrate:   进给速度 (mm/min)，为 None 时不改变当前 F
+            feedrate:   进给速度 (mm/min)，为 None 或与上一次相同时不发送 F
+                        （绝对模式下，与上一次相同的坐标也不发送；
+                        所有坐标都没变时整条 G1 都不发送）
             overall_timeout: 此次运动的最大等待时间（秒）
+            wait_ok:    False 时只排队发送，由调用方最后 wait_idle() / wait_moves()
         """
-        parts = ["G1"]
-        if x is not None:
-            parts.append(f"X{x:.3f}")
-        if y is not None:
-            parts.append(f"Y{y:.3f}")
-        if z is not None:
-            parts.append(f"Z{z:.3f}")
-        if u is not None:
-            parts.append(f"U{u:.3f}")
-        if feedrate is not None:
-            parts.append(f"F{feedrate:.0f}")
+        last = self._last
+        eps = self.POS_EPS
+        absolute = self._absolute
+
+        # 直接拼 bytes：省掉 f-string、join、strip、encode 这些中间字符串
+        buf = bytearray(b"G1")
+        for axis, fmt, val in (
+            ("X", b" X%.3f".__mod__, x),
+            ("Y", b" Y%.3f".__mod__, y),
+            ("Z", b" Z%.3f".__mod__, z),
+            ("U", _u_token, u),
+        ):
+            if val is None:
+                continue
+            prev = last[axis]
+            if absolute and prev is not None and abs(val - prev) < eps:
+                continue
+            buf += fmt(val)
+            last[axis] = val if absolute else None
+        if len(buf) == 2:
+            # 所有轴都已经在目标位置：整条不发送，F 留给下一条真正的运动
+            if wait_ok:
+                self.wait_idle(overall_timeout)
+            return
+        if feedrate is not None and feedrate != last["F"]:
+            buf += b" F%.0f" % feedrate
+            last["F"] = feedrate
+        buf += b"\n"
 
-        cmd = " ".join(parts)
-        self.send_gcode(cmd, wait_ok=True, overall_timeout=overall_timeout)
+        self._send_bytes(buf, wait_ok, overall_timeout)
 
     def move_relative(
         self,
@@ -335,6 +656,7 @@ class Robot:
         du: float = 0.0,
         feedrate: Optional[float] = None,
         overall_timeout: float = 999.0,
+        wait_ok: bool = True,
     ) -> None:
         """
         Relative move using G91 + G1 + G90.
@@ -344,9 +666,13 @@ class Robot:
         Args:
             dx,dy,dz,du: 相对位移量
             feedrate:    进给速度 (mm/min)
+            wait_ok:     False 时三行都只排队发送
         """
-        # 切换相对模式
-        self.set_relative_mode()
+        if abs(dx) + abs(dy) + abs(dz) + abs(du) < self.POS_EPS:
+            # 位移为 0（例如吸 0 µL）：不发送
+            if wait_ok:
+                self.wait_idle(overall_timeout)
+            return
 
         parts = ["G1"]
         if dx != 0.0:
@@ -357,14 +683,14 @@ class Robot:
             parts.append(f"Z{dz:.3f}")
         if du != 0.0:
             parts.append(f"U{du:.3f}")
-        if feedrate is not None:
+        if feedrate is not None and feedrate != self._last["F"]:
             parts.append(f"F{feedrate:.0f}")
 
         cmd = " ".join(parts)
-        self.send_gcode(cmd, wait_ok=True, overall_timeout=overall_timeout)
-
-        # 切回绝对模式
-        self.set_absolute_mode()
+        # 切换相对模式 → 运动 → 切回绝对模式，三行一次写出
+        self.send_lines(["G91", cmd, "G90"], wait_ok=wait_ok, overall_timeout=overall_timeout)
+        if feedrate is not None:
+            self._last["F"] = feedrate
 
 
     def get_position(self) -> dict:
@@ -373,28 +699,62 @@ class Robot:
         返回示例字典: {"X": 123.45, "Y": 67.89, "Z": 10.00, "U": 5.00}
         """
         self._ensure_connected()
+        # 先收完之前排队命令的 'ok'，下面读到的才是 M114 的回复
+        self.wait_idle()
+        if self._orphans:
+            self._settle_orphans()
         self._write_line("M114")
+        self._inflight += 1
 
-        # 连续读几行直到包含坐标
-        for _ in range(20):
-            line = self._read_line()
-            if not line:
-                continue
-            # M114 格式示例:
-            # "X:10.000 Y:20.000 Z:30.000 U:5.000 Count ...."
-            if "X:" in line:
-                parts = line.replace(",", " ").split()
-                pos = {}
-                for p in parts:
-                    if ":" in p:
-                        key, val = p.split(":", 1)
-                        if key in ("X", "Y", "Z", "U"):
-                            try:
-                                pos[key] = float(val)
-                            except ValueError:
-                                pass
-                return pos
-        return {}
+        # 收集到 M114 自己的 'ok' 为止（总共最多等串口 timeout），再整体解析。
+        # M114 格式示例:
+        # "X:10.00 Y:20.00 Z:30.00 U:5.00 Count X:800 Y:1600 Z:..."
+        lines = []
+        deadline = time.monotonic_ns() + int(self.timeout * 1e9)
+        while True:
+            line = self._read_line((deadline - time.monotonic_ns()) / 1e9)
+            if line.lower() == "ok":
+                break
+            if line:
+                lines.append(line)
+            elif time.monotonic_ns() >= deadline:
+                # 没等到 'ok'：M114 不再算在途，记为无主行——下次写入前限时收掉迟到的 'ok'，
+                # 真丢了也只多等 ORPHAN_GRACE，不会占用下一条命令的超时
+                self._inflight -= 1
+                self._orphans += 1
+                self._forget_position()
+                raise RuntimeError("Timeout waiting for M114 reply.")
+        blob = "\n".join(lines)
+        if "Error" in blob or "error" in blob.lower():
+            self._inflight = 0
+            self._forget_position()
+            raise RuntimeError(f"Firmware error: {blob}")
+        self._inflight -= 1
+
+        # "Count" 之后是步数，不是坐标
+        coords = blob.split("Count", 1)[0]
+        pos = {m[1]: float(m[2]) for m in _M114_RE.finditer(coords)}
+
+        # 以固件为准更新坐标记录（F 不受 M114 影响）
+        feed = self._last["F"]
+        self._forget_position()
+        self._last.update(pos)
+        self._last["F"] = feed
+        return pos
+
+    def _current(self, axis: str) -> float:
+        """
+        Current absolute position of one axis.
+
+        某轴当前的绝对坐标：有记录（上一次发出的目标）就直接用，
+        否则用 M114 查询一次并记下。
+        """
+        val = self._last[axis]
+        if val is None:
+            val = self.get_position().get(axis)
+            if val is None:
+                raise RuntimeError(f"Cannot read {axis} position from M114.")
+        return val
 
     # --------------------------------------------------
     # 高层功能：注射器选择 / Syringe selection
@@ -427,6 +787,32 @@ class Robot:
             raise RuntimeError("No syringe selected. 请先调用 set_syringe() 或传入 syringe_name。")
         return self.current_syringe
 
+    def get_labware(
+        self,
+        deck: Deck,
+        labware_type: LabwareType,
+        slot_id: str,
+    ) -> LabwareInstance:
+        """
+        Return the (cached) labware instance of a type on a deck slot.
+
+        取某个槽位上某类器皿的实例，同一个 deck 上重复使用时直接返回缓存。
+        """
+        if deck is not self._labware_deck:
+            self._labware_cache.clear()
+            self._labware_deck = deck
+        key = (labware_type, slot_id)
+        inst = self._labware_cache.get(key)
+        if inst is None:
+            inst = LabwareInstance(
+                labware_type,
+                deck.slots[slot_id],
+                label=f"{labware_type.name}_slot{slot_id}",
+                deck=deck,
+            )
+            self._labware_cache[key] = inst
+        return inst
+
     # --------------------------------------------------
     # 高层功能：戴 tip / Remove tip
     # --------------------------------------------------
@@ -449,15 +835,30 @@ class Robot:
             well:    孔位，例如 "A1", "B3"
             n_cycles: 在接触高度和压入高度之间来回“捣”的次数
         """
-        slot = deck.slots[slot_id]
-        tiprack = LabwareInstance(
-            LABWARE_TIPRACK_96,
-            slot,
-            label=f"tiprack_slot{slot_id}",
-            deck=deck,
-        )
+        tiprack = self.get_labware(deck, LABWARE_TIPRACK_96, slot_id)
+        x, y = tiprack.well_position_machine(well)
 
-        t = tiprack.type
+        # 整个动作只有孔位 XY 会变：第一次调用时把 G-code 渲染成模板，之后只代入 XY
+        key = ("pick_up_tip", tiprack.type, n_cycles)
+        tpl = self._template_cache.get(key)
+        if tpl is None:
+            tpl = self._render_pick_up_tip(tiprack.type, n_cycles)
+            self._template_cache[key] = tpl
+        head, xy_fmt, tail = tpl
+
+        self.send_lines(head + [xy_fmt % (x, y)] + tail)
+        self.wait_moves()
+
+    @staticmethod
+    def _render_pick_up_tip(
+        t: LabwareType,
+        n_cycles: int,
+    ) -> Tuple[List[str], str, List[str]]:
+        """
+        Render the pick_up_tip G-code around the well XY.
+
+        生成戴 tip 的 G-code 模板：(XY 之前的行, XY 行的格式串, XY 之后的行)。
+        """
         z_safe = t.safe_z
         z_touch = t.tip_touch_z
         z_press = t.tip_press_z
@@ -466,33 +867,36 @@ class Robot:
         if z_touch is None or z_press is None or z_full is None:
             raise RuntimeError("Tiprack LabwareType missing tip Z settings.")
 
-        self.set_absolute_mode()
-
-        # 1) 抬到安全高度 / move up to safe height
-        self.move_to(z=z_safe, feedrate=750.0)
+        head = [
+            "G90",
+            # 1) 抬到安全高度 / move up to safe height
+            f"G1 Z{z_safe:.3f} F750",
+        ]
 
         # 2) 移动到指定孔位上方 / move above target well
-        x, y = tiprack.well_position_machine(well)
-        self.move_to(x=x, y=y, feedrate=7500.0)
-
-        # 3) 下到“刚接触”高度 / go to touch height
-        self.move_to(z=z_touch, feedrate=750.0)
-        self.dwell(0.2)
+        xy_fmt = "G1 X%.3f Y%.3f F7500"
 
+        tail = [
+            # 3) 下到“刚接触”高度 / go to touch height
+            f"G1 Z{z_touch:.3f} F750",
+            "G4 P200",
+        ]
         # 4) 上下“捣几次”帮助对准和插入 / up-down cycles
-        for _ in range(n_cycles):
-            self.move_to(z=z_press, feedrate=600.0)
-            self.dwell(0.2)
-            self.move_to(z=z_touch, feedrate=600.0)
-            self.dwell(0.2)
-
-        # 5) 一插到底 / final full insertion
-        self.move_to(z=z_full, feedrate=750.0)
-        self.dwell(0.2)
-
-        # 6) 略微抬起到 press 高度，再回安全高度 / slightly up then safe height
-        self.move_to(z=z_press, feedrate=750.0)
-        self.move_to(z=z_safe, feedrate=600.0)
+        tail += [
+            f"G1 Z{z_press:.3f} F600",
+            "G4 P200",
+            f"G1 Z{z_touch:.3f} F600",
+            "G4 P200",
+        ] * n_cycles
+        tail += [
+            # 5) 一插到底 / final full insertion
+            f"G1 Z{z_full:.3f} F750",
+            "G4 P200",
+            # 6) 略微抬起到 press 高度，再回安全高度 / slightly up then safe height
+            f"G1 Z{z_press:.3f} F750",
+            f"G1 Z{z_safe:.3f} F600",
+        ]
+        return head, xy_fmt, tail
 
     def drop_tip_scrape(
         self,
@@ -508,13 +912,7 @@ class Robot:
         通过将 tip 在废 tip 盒的侧壁“蹭”出来，从而抛弃用过的 tip。
         """
 
-        slot = deck.slots[slot_id]
-        waste = LabwareInstance(
-            LABWARE_TIPWASTE_BOX,
-            slot,
-            label=f"tipwaste_slot{slot_id}",
-            deck=deck,
-        )
+        waste = self.get_labware(deck, LABWARE_TIPWASTE_BOX, slot_id)
 
         t = waste.type
         z_safe = t.safe_z
@@ -524,16 +922,16 @@ class Robot:
 
         cx, cy = deck.slot_center_machine(slot_id)
 
-        self.set_absolute_mode()
+        self.set_absolute_mode(wait_ok=False)
 
         # 1) 抬到安全高度
-        self.move_to(z=z_safe, feedrate=600.0)
+        self.move_to(z=z_safe, feedrate=600.0, wait_ok=False)
 
         # 2) 去槽位中心
-        self.move_to(x=cx, y=cy, feedrate=7500.0)
+        self.move_to(x=cx, y=cy, feedrate=7500.0, wait_ok=False)
 
         # 3) 下到蹭 tip 的高度
-        self.move_to(z=z_scrape, feedrate=750.0)
+        self.move_to(z=z_scrape, feedrate=750.0, wait_ok=False)
 
         # 4) 计算左右蹭掉的位置
         if edge == "left":
@@ -544,10 +942,11 @@ class Robot:
             raise ValueError("edge must be 'left' or 'right'.")
 
         # 侧向蹭掉 tip
-        self.move_to(x=x_target, y=cy, feedrate=2000.0)
+        self.move_to(x=x_target, y=cy, feedrate=2000.0, wait_ok=False)
 
         # 5) 抬回安全高度
-        self.move_to(z=z_safe, feedrate=600.0)
+        self.move_to(z=z_safe, feedrate=600.0, wait_ok=False)
+        self.wait_moves()
 
 
     # --------------------------------------------------
@@ -585,83 +984,107 @@ class Robot:
             feed_z_down/up: Z 方向下降/上升速度
             feed_u:    U 轴推拉速度
         """
+        self.transfer_many(
+            deck,
+            [(src_slot, src_well, dst_slot, dst_well, volume_ul)],
+            syringe=syringe,
+            feed_xy=feed_xy,
+            feed_z_down=feed_z_down,
+            feed_z_up=feed_z_up,
+            feed_u=feed_u,
+        )
+
+    def transfer_many(
+        self,
+        deck: Deck,
+        pairs: Iterable[Tuple[str, str, str, str, float]],
+        syringe: str = "10ml",
+        feed_xy: float = 3000.0,
+        feed_z_down: float = 200.0,
+        feed_z_up: float = 300.0,
+        feed_u: float = 200.0,
+    ) -> None:
+        """
+        Run several transfers back to back, synchronising once at the end.
+
+        批量移液：pairs 中每一项为 (src_slot, src_well, dst_slot, dst_well, volume_ul)。
+        开始移动前先把所有孔位坐标和 U 行程算好，孔位 / 体积有问题时
+        机器人还没动就会报错；之后连续排队发送全部 G-code，最后只等一次 M400。
+        其余参数同 transfer_volume。
+        """
         # 选择注射器类型 / select syringe type
         syr = self._get_syringe(syringe)
-
-        # 计算 U 轴行程 / compute U travel
-        dU = volume_ul * syr.u_per_ul
         u_base = syr.u_base
-        u_asp = u_base + dU
-
-        if syr.u_min is not None and u_base < syr.u_min:
-            raise ValueError("u_base below syringe u_min.")
-        if syr.u_max is not None and u_asp > syr.u_max:
-            raise ValueError("U travel exceeds syringe u_max, check volume.")
 
+        # 预先计算每次移液的 (源板类型, 源孔 XY, 吸液后 U, 目标板类型, 目标孔 XY)
         # 源、目标板实例（这里假设使用的是同一类 48 孔板）
         # Instantiate source and destination plates (48-well in this example)
-        src_plate = LabwareInstance(
-            LABWARE_48WELL_10MM,
-            deck.slots[src_slot],
-            label=f"plate_src_slot{src_slot}",
-            deck=deck,
-        )
-        dst_plate = LabwareInstance(
-            LABWARE_48WELL_10MM,
-            deck.slots[dst_slot],
-            label=f"plate_dst_slot{dst_slot}",
-            deck=deck,
-        )
-
-        t_src = src_plate.type
-        t_dst = dst_plate.type
-
-        # Z 高度：安全高度 + 吸液高度 + 注液高度
-        # Z heights
-        z_safe_src = t_src.safe_z
-        z_asp = t_src.aspirate_z or t_src.bottom_z
-
-        z_safe_dst = t_dst.safe_z
-        z_disp = t_dst.dispense_z or t_dst.bottom_z
-
-        self.set_absolute_mode()
-
-        # ---------- 吸液阶段 / Aspirate ----------
-        # 1) U 回到基准位置 / reset U to base
-        self.move_to(u=u_base, feedrate=feed_u)
+        plan = []
+        for src_slot, src_well, dst_slot, dst_well, volume_ul in pairs:
+            src_plate = self.get_labware(deck, LABWARE_48WELL_10MM, src_slot)
+            dst_plate = self.get_labware(deck, LABWARE_48WELL_10MM, dst_slot)
+            plan.append((
+                src_plate.type,
+                src_plate.well_position_machine(src_well),
+                # 计算 U 轴行程（含行程限制检查） / compute U travel
+                syr.ul_to_u(volume_ul),
+                dst_plate.type,
+                dst_plate.well_position_machine(dst_well),
+            ))
+
+        self.set_absolute_mode(wait_ok=False)
+
+        for t_src, (x_src, y_src), u_asp, t_dst, (x_dst, y_dst) in plan:
+            # Z 高度：安全高度 + 吸液高度 + 注液高度
+            # Z heights
+            z_safe_src = t_src.safe_z
+            z_asp = t_src.aspirate_z or t_src.bottom_z
+
+            z_safe_dst = t_dst.safe_z
+            z_disp = t_dst.dispense_z or t_dst.bottom_z
+
+            # ---------- 吸液阶段 / Aspirate ----------
+            # 1) U 回到基准位置 + 2) 抬到源板安全高度
+            #    reset U to base while rising to safe Z above source plate
+            #    两者都在当前 XY 上进行，合成一条 G1 同时运动；
+            #    U 已经在基准位置时（上一次移液刚推回）只抬 Z，保持原来的抬升速度。
+            u_last = self._last["U"]
+            if u_last is not None and abs(u_last - u_base) < self.POS_EPS:
+                self.move_to(z=z_safe_src, feedrate=feed_z_up, wait_ok=False)
+            else:
+                self.move_to(z=z_safe_src, u=u_base, feedrate=feed_u, wait_ok=False)
 
-        # 2) 抬到源板安全高度 / safe Z above source plate
-        self.move_to(z=z_safe_src, feedrate=feed_z_up)
+            # 3) XY 移到源孔 / move to source well
+            self.move_to(x=x_src, y=y_src, feedrate=feed_xy, wait_ok=False)
 
-        # 3) XY 移到源孔 / move to source well
-        x_src, y_src = src_plate.well_position_machine(src_well)
-        self.move_to(x=x_src, y=y_src, feedrate=feed_xy)
+            # 4) 下探到吸液高度 / go down to aspiration height
+            self.move_to(z=z_asp, feedrate=feed_z_down, wait_ok=False)
 
-        # 4) 下探到吸液高度 / go down to aspiration height
-        self.move_to(z=z_asp, feedrate=feed_z_down)
+            # 5) U 轴向外拉，完成吸液 / pull plunger to aspirate
+            self.move_to(u=u_asp, feedrate=feed_u, wait_ok=False)
 
-        # 5) U 轴向外拉，完成吸液 / pull plunger to aspirate
-        self.move_to(u=u_asp, feedrate=feed_u)
+            # 6) 抬回安全高度 / back to safe Z
+            #    两块板安全高度相同时，这一步和下面的 1) 是同一条 G1，只发一次
+            if z_safe_src != z_safe_dst:
+                self.move_to(z=z_safe_src, feedrate=feed_z_up, wait_ok=False)
 
-        # 6) 抬回安全高度 / back to safe Z
-        self.move_to(z=z_safe_src, feedrate=feed_z_up)
+            # ---------- 注液阶段 / Dispense ----------
+            # 1) 抬到目标板安全高度 / safe Z above destination plate
+            self.move_to(z=z_safe_dst, feedrate=feed_z_up, wait_ok=False)
 
-        # ---------- 注液阶段 / Dispense ----------
-        # 1) 抬到目标板安全高度 / safe Z above destination plate
-        self.move_to(z=z_safe_dst, feedrate=feed_z_up)
+            # 2) XY 移动到目标孔 / move to destination well
+            self.move_to(x=x_dst, y=y_dst, feedrate=feed_xy, wait_ok=False)
 
-        # 2) XY 移动到目标孔 / move to destination well
-        x_dst, y_dst = dst_plate.well_position_machine(dst_well)
-        self.move_to(x=x_dst, y=y_dst, feedrate=feed_xy)
+            # 3) 下探到注液高度 / go down to dispense height
+            self.move_to(z=z_disp, feedrate=feed_z_down, wait_ok=False)
 
-        # 3) 下探到注液高度 / go down to dispense height
-        self.move_to(z=z_disp, feedrate=feed_z_down)
+            # 4) U 轴回到基准位置，完成注液 / push plunger back to base
+            self.move_to(u=u_base, feedrate=feed_u, wait_ok=False)
 
-        # 4) U 轴回到基准位置，完成注液 / push plunger back to base
-        self.move_to(u=u_base, feedrate=feed_u)
+            # 5) 抬回安全高度 / back to safe Z
+            self.move_to(z=z_safe_dst, feedrate=feed_z_up, wait_ok=False)
 
-        # 5) 抬回安全高度 / back to safe Z
-        self.move_to(z=z_safe_dst, feedrate=feed_z_up)
+        self.wait_moves()
 
     # --------------------------------------------------
     # 高层功能：显式吸液 / 排液
@@ -713,16 +1136,11 @@ class Robot:
         syr = self._get_syringe(syringe)
         dU = volume_ul * syr.u_per_ul  # 本次需要拉动的 U 行程（相对） / relative U travel
 
-        self.set_absolute_mode()
+        self.set_absolute_mode(wait_ok=False)
 
         # 模式一：基于 slot + well 的吸液（默认使用 48 孔板）
         if deck is not None and slot_id is not None and well is not None:
-            plate = LabwareInstance(
-                labware_type,
-                deck.slots[slot_id],
-                label=f"asp_plate_slot{slot_id}",
-                deck=deck,
-            )
+            plate = self.get_labware(deck, labware_type, slot_id)
             t = plate.type
             z_safe_local = t.safe_z
             z_asp_local = t.aspirate_z or t.bottom_z
@@ -739,23 +1157,25 @@ class Robot:
 
             if labware_type is LABWARE_BEAKER_1WELL:
                 # 目标是烧杯：先抬 Z 再走 XY，避免用孔板的低高度撞杯壁
-                self.move_to(z=z_safe_local, feedrate=feed_z_up)
+                self.move_to(z=z_safe_local, feedrate=feed_z_up, wait_ok=False)
                 x, y = plate.well_position_machine(well)
-                self.move_to(x=x, y=y, feedrate=feed_xy)
+                self.move_to(x=x, y=y, feedrate=feed_xy, wait_ok=False)
             else:
                 # 目标是孔板：假定当前已经在足够高的安全高度，
                 # 先 XY 离开烧杯区域，再按孔板几何调整 Z
                 x, y = plate.well_position_machine(well)
-                self.move_to(x=x, y=y, feedrate=feed_xy)
+                self.move_to(x=x, y=y, feedrate=feed_xy, wait_ok=False)
 
             # 3) 下探到吸液高度
-            self.move_to(z=z_asp_local, feedrate=feed_z_down)
+            self.move_to(z=z_asp_local, feedrate=feed_z_down, wait_ok=False)
 
             # 4) U 轴相对拉动，完成吸液
-            self.move_relative(du=dU, feedrate=feed_u)
+            #    （换算成绝对坐标：一行 G1，不用 G91 / G90 来回切换）
+            self.move_to(u=self._current("U") + dU, feedrate=feed_u, wait_ok=False)
 
             # 5) 回到安全高度
-            self.move_to(z=z_safe_local, feedrate=feed_z_up)
+            self.move_to(z=z_safe_local, feedrate=feed_z_up, wait_ok=False)
+            self.wait_moves()
             return
 
         # 模式二：基于当前 XY 的吸液（例如烧杯）
@@ -766,13 +1186,14 @@ class Robot:
             )
 
         # 1) 抬到安全高度
-        self.move_to(z=z_safe, feedrate=feed_z_up)
+        self.move_to(z=z_safe, feedrate=feed_z_up, wait_ok=False)
         # 2) 下探到吸液高度
-        self.move_to(z=z_aspirate, feedrate=feed_z_down)
+        self.move_to(z=z_aspirate, feedrate=feed_z_down, wait_ok=False)
         # 3) U 轴相对拉动
-        self.move_relative(du=dU, feedrate=feed_u)
+        self.move_to(u=self._current("U") + dU, feedrate=feed_u, wait_ok=False)
         # 4) 回到安全高度
-        self.move_to(z=z_safe, feedrate=feed_z_up)
+        self.move_to(z=z_safe, feedrate=feed_z_up, wait_ok=False)
+        self.wait_moves()
 
     def dispense(
         self,
@@ -815,39 +1236,36 @@ class Robot:
         syr = self._get_syringe(syringe)
         dU = volume_ul * syr.u_per_ul  # 本次需要推回的 U 行程（相对）
 
-        self.set_absolute_mode()
+        self.set_absolute_mode(wait_ok=False)
 
         # 模式一：基于 slot + well 的排液（48 孔板）
         if deck is not None and slot_id is not None and well is not None:
-            plate = LabwareInstance(
-                labware_type,
-                deck.slots[slot_id],
-                label=f"disp_plate_slot{slot_id}",
-                deck=deck,
-            )
+            plate = self.get_labware(deck, labware_type, slot_id)
             t = plate.type
             z_safe_local = t.safe_z
             z_disp_local = t.dispense_z or t.bottom_z
 
             if labware_type is LABWARE_BEAKER_1WELL:
                 # 目标是烧杯：先抬 Z 再走 XY，避免用孔板的低高度撞杯壁
-                self.move_to(z=z_safe_local, feedrate=feed_z_up)
+                self.move_to(z=z_safe_local, feedrate=feed_z_up, wait_ok=False)
                 x, y = plate.well_position_machine(well)
-                self.move_to(x=x, y=y, feedrate=feed_xy)
+                self.move_to(x=x, y=y, feedrate=feed_xy, wait_ok=False)
             else:
                 # 目标是孔板：假定当前已经在足够高的安全高度，
                 # 先 XY 离开烧杯区域，再按孔板几何调整 Z
                 x, y = plate.well_position_machine(well)
-                self.move_to(x=x, y=y, feedrate=feed_xy)
+                self.move_to(x=x, y=y, feedrate=feed_xy, wait_ok=False)
 
             # 3) 下探到注液高度
-            self.move_to(z=z_disp_local, feedrate=feed_z_down)
+            self.move_to(z=z_disp_local, feedrate=feed_z_down, wait_ok=False)
 
             # 4) U 轴相对推回，完成排液
-            self.move_relative(du=-dU, feedrate=feed_u)
+            #    （换算成绝对坐标：一行 G1，不用 G91 / G90 来回切换）
+            self.move_to(u=self._current("U") - dU, feedrate=feed_u, wait_ok=False)
 
             # 5) 回到安全高度
-            self.move_to(z=z_safe_local, feedrate=feed_z_up)
+            self.move_to(z=z_safe_local, feedrate=feed_z_up, wait_ok=False)
+            self.wait_moves()
             return
 
         # 模式二：基于当前 XY 的排液（例如烧杯）
@@ -858,13 +1276,14 @@ class Robot:
             )
 
         # 1) 抬到安全高度
-        self.move_to(z=z_safe, feedrate=feed_z_up)
+        self.move_to(z=z_safe, feedrate=feed_z_up, wait_ok=False)
         # 2) 下探到注液高度
-        self.move_to(z=z_dispense, feedrate=feed_z_down)
+        self.move_to(z=z_dispense, feedrate=feed_z_down, wait_ok=False)
         # 3) U 轴相对推回
-        self.move_relative(du=-dU, feedrate=feed_u)
+        self.move_to(u=self._current("U") - dU, feedrate=feed_u, wait_ok=False)
         # 4) 回到安全高度
-        self.move_to(z=z_safe, feedrate=feed_z_up)
+        self.move_to(z=z_safe, feedrate=feed_z_up, wait_ok=False)
+        self.wait_moves()
 
     def dispense_to_beaker(
         self,